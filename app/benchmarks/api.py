@@ -0,0 +1,144 @@
+""" Load test the API in-process through an ASGI client and store the results as JSON.
+
+    Seeds companies x users x tasks into the benchmark database (a throw-away SQLite file unless
+    BENCHMARK_DATABASE_URL is set; the tables of that database are dropped and recreated), then
+    reports for each endpoint p50/p95/p99 latency, throughput and peak allocations per request.
+
+    > cd app
+    > python -m benchmarks.api --companies 5 --users 100 --tasks 20
+    > python -m benchmarks.api --compare benchmarks/results/api-20261018-101500.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import time
+import tracemalloc
+from datetime import datetime
+from benchmarks.common import configure_database, create_schema, summarize
+
+# The database must be configured before the app modules create their engines
+database_url = configure_database()
+
+import httpx
+from benchmarks.seed import PASSWORD, seed
+from database import get_async_engine
+from main import app
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def build_scenarios(data, tokens: dict) -> dict:
+    """ Requests of each benchmarked endpoint: name -> factory returning (method, url, kwargs) """
+    def auth(user_name):
+        return {"headers": {"Authorization": f"Bearer {tokens[user_name]}"}}
+    admin, member = data.admin_user_names[0], data.member_user_names[0] if data.member_user_names else data.admin_user_names[0]
+    return {
+        "POST /auth/token": lambda: ("POST", "/auth/token", {"data": {"username": random.choice(data.member_user_names or data.admin_user_names), "password": PASSWORD}}),
+        "GET /tasks (admin)": lambda: ("GET", "/tasks", auth(admin)),
+        "GET /tasks (member)": lambda: ("GET", "/tasks", auth(member)),
+        "GET /users (admin)": lambda: ("GET", "/users", auth(admin)),
+        "GET /companies": lambda: ("GET", "/companies", {}),
+        "GET /companies/{id}": lambda: ("GET", f"/companies/{random.choice(data.company_ids)}", {}),
+    }
+
+async def run_scenario(client: httpx.AsyncClient, make_request, requests: int, concurrency: int) -> dict:
+    """ Send the requests with a fixed number of concurrent workers and measure them """
+    latencies, errors = [], 0
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            method, url, kwargs = make_request()
+            started = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append(time.perf_counter() - started)
+            errors += response.status_code >= 400
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {**summarize(latencies), "errors": errors, "throughput_rps": requests / elapsed}
+
+async def measure_allocations(client: httpx.AsyncClient, make_request, requests: int) -> dict:
+    """ Peak traced memory allocated while serving a request, sequentially to isolate each request """
+    peaks = []
+    tracemalloc.start()
+    try:
+        for _ in range(requests):
+            method, url, kwargs = make_request()
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            await client.request(method, url, **kwargs)
+            peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+    finally:
+        tracemalloc.stop()
+    return {"alloc_peak_kib_mean": sum(peaks) / len(peaks) / 1024, "alloc_peak_kib_max": max(peaks) / 1024}
+
+def compare(current: dict, baseline_path: str):
+    with open(baseline_path) as file:
+        baseline = json.load(file)
+    print(f"\nCompared with {baseline_path}")
+    print(f"{'endpoint':<22} {'p50':>9} {'p95':>9} {'rps':>9}")
+    for name, result in current["endpoints"].items():
+        previous = baseline["endpoints"].get(name)
+        if previous is None:
+            continue
+        def delta(key):
+            return f"{(result[key] - previous[key]) / previous[key] * 100:+8.1f}%" if previous[key] else "     n/a"
+        print(f"{name:<22} {delta('p50_ms')} {delta('p95_ms')} {delta('throughput_rps')}")
+
+async def main(args) -> dict:
+    await create_schema()
+    data = await seed(args.companies, args.users, args.tasks)
+    results = {
+        "created_at": datetime.now().isoformat(),
+        "database": get_async_engine().dialect.name,
+        "python": platform.python_version(),
+        "dataset": {"companies": args.companies, "users_per_company": args.users, "tasks_per_user": args.tasks, "tasks": data.task_count},
+        "load": {"requests": args.requests, "concurrency": args.concurrency},
+        "endpoints": {}
+    }
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark") as client:
+        tokens = {}
+        for user_name in {data.admin_user_names[0], *data.member_user_names[:1]}:
+            response = await client.post("/auth/token", data={"username": user_name, "password": PASSWORD})
+            tokens[user_name] = response.json()["access_token"]
+        for name, make_request in build_scenarios(data, tokens).items():
+            if args.endpoint and not any(pattern in name for pattern in args.endpoint):
+                continue
+            # bcrypt bound: keep the login scenario short
+            requests = max(args.requests // 10, 1) if name.startswith("POST /auth") else args.requests
+            result = await run_scenario(client, make_request, requests, args.concurrency)
+            result.update(await measure_allocations(client, make_request, min(requests, args.alloc_requests)))
+            results["endpoints"][name] = result
+            print(f"{name:<22} p50 {result['p50_ms']:8.2f}ms  p95 {result['p95_ms']:8.2f}ms  p99 {result['p99_ms']:8.2f}ms  "
+                  f"{result['throughput_rps']:8.1f} req/s  {result['alloc_peak_kib_mean']:8.1f} KiB/req  errors {result['errors']}")
+    await get_async_engine().dispose()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--companies", type=int, default=2)
+    parser.add_argument("--users", type=int, default=50, help="Users per company")
+    parser.add_argument("--tasks", type=int, default=20, help="Tasks per user")
+    parser.add_argument("--requests", type=int, default=500, help="Requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--alloc-requests", type=int, default=50, help="Requests per endpoint traced for allocations")
+    parser.add_argument("--endpoint", action="append", help="Only run the endpoints whose name contains this text")
+    parser.add_argument("--output", help="Result file. Defaults to benchmarks/results/api-<timestamp>.json")
+    parser.add_argument("--compare", help="Previous result file to compare with")
+    args = parser.parse_args()
+
+    results = asyncio.run(main(args))
+    output = args.output or os.path.join(RESULTS_DIR, f"api-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as file:
+        json.dump(results, file, indent=2)
+    print(f"\nResults saved to {output}")
+    if args.compare:
+        compare(results, args.compare)
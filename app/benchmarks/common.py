@@ -0,0 +1,53 @@
+import os
+import statistics
+import tempfile
+
+
+def configure_database(url: str = None) -> str:
+    """ Point the app at the benchmark database. Must be called before importing database/schemas.
+        Defaults to a throw-away SQLite file when BENCHMARK_DATABASE_URL is not set.
+
+    Args:
+        url (str, optional): Async database url. Defaults to None.
+
+    Returns:
+        str: The async database url in use
+    """
+    url = url or os.environ.get("BENCHMARK_DATABASE_URL")
+    if url is None:
+        url = f"sqlite+aiosqlite:///{tempfile.mkdtemp(prefix='todo-bench-')}/bench.db"
+    os.environ["ASYNC_DATABASE_URL"] = url
+    os.environ["DATABASE_URL"] = url.replace("+aiosqlite", "").replace("+asyncpg", "")
+    os.environ.setdefault("JWT_SECRET", "benchmark-secret")
+    os.environ.setdefault("JWT_ALGORITHM", "HS256")
+    # The load tests send many requests per user from a single client
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+    return url
+
+async def create_schema():
+    """ Create all tables on the benchmark database """
+    import database
+    import schemas.company  # registers companies, users and tasks
+    async with database.get_async_engine().begin() as conn:
+        await conn.run_sync(database.Base.metadata.drop_all)
+        await conn.run_sync(database.Base.metadata.create_all)
+
+def summarize(samples: list[float]) -> dict:
+    """ Summarize latency samples (seconds) into milliseconds percentiles
+
+    Args:
+        samples (list[float]): Latencies in seconds
+
+    Returns:
+        dict: p50/p95/p99/mean in milliseconds
+    """
+    ordered = sorted(samples)
+    def percentile(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))] * 1000
+    return {
+        "count": len(ordered),
+        "p50_ms": percentile(50),
+        "p95_ms": percentile(95),
+        "p99_ms": percentile(99),
+        "mean_ms": statistics.fmean(ordered) * 1000
+    }
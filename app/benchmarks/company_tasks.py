@@ -0,0 +1,77 @@
+""" Compare the admin task listing: user ids + IN (...) (two queries) vs tasks JOIN users (one query)
+
+    > cd app
+    > python -m benchmarks.company_tasks --sizes 10 1000 10000 --tasks-per-user 5
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from benchmarks.common import configure_database, create_schema, summarize
+
+# The database must be configured before the app modules create their engines
+configure_database()
+
+from sqlalchemy import insert, select
+from database import get_async_engine, new_async_session
+from schemas.base_entity import Priority, TaskStatus
+from schemas.company import Company
+from schemas.task import Task
+from schemas.user import User
+from services import task as task_service
+
+
+async def seed_company(db, user_count: int, tasks_per_user: int) -> uuid.UUID:
+    company_id = uuid.uuid4()
+    await db.execute(insert(Company), [{"id": company_id, "name": f"Company {user_count}", "rating": 3}])
+    users = [
+        {"id": uuid.uuid4(), "email": f"{company_id}-{i}@bench", "user_name": f"{company_id}-{i}", "is_active": True, "is_admin": False, "company_id": company_id}
+        for i in range(user_count)
+    ]
+    for start in range(0, len(users), 5000):
+        await db.execute(insert(User), users[start:start + 5000])
+    tasks = [
+        {"id": uuid.uuid4(), "summary": f"Task {i}", "description": "Benchmark task", "status": TaskStatus.NEW, "priority": Priority.MEDIUM, "user_id": user["id"]}
+        for user in users for i in range(tasks_per_user)
+    ]
+    for start in range(0, len(tasks), 5000):
+        await db.execute(insert(Task), tasks[start:start + 5000])
+    await db.commit()
+    return company_id
+
+async def two_queries(db, company_id: uuid.UUID, limit: int):
+    user_ids = (await db.scalars(select(User.id).where(User.company_id == company_id, User.is_active == True))).all()
+    return await task_service.get_tasks_by_user_ids(user_ids, db, limit)
+
+async def single_query(db, company_id: uuid.UUID, limit: int):
+    return await task_service.get_tasks_by_company_id(company_id, db, limit)
+
+async def measure(func, company_id: uuid.UUID, limit: int, repeat: int) -> dict:
+    samples = []
+    for _ in range(repeat):
+        async with new_async_session() as db:
+            started = time.perf_counter()
+            await func(db, company_id, limit)
+            samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+async def main(sizes: list[int], tasks_per_user: int, limit: int, repeat: int):
+    await create_schema()
+    print(f"{'users':>8} {'approach':>14} {'p50 ms':>9} {'p95 ms':>9}")
+    for size in sizes:
+        async with new_async_session() as db:
+            company_id = await seed_company(db, size, tasks_per_user)
+        for name, func in (("ids + IN", two_queries), ("JOIN", single_query)):
+            result = await measure(func, company_id, limit, repeat)
+            print(f"{size:>8} {name:>14} {result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f}")
+    await get_async_engine().dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 10000], help="Number of users per company")
+    parser.add_argument("--tasks-per-user", type=int, default=5)
+    parser.add_argument("--limit", type=int, default=50, help="Page size")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.sizes, args.tasks_per_user, args.limit, args.repeat))
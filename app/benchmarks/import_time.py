@@ -0,0 +1,88 @@
+""" Cold start: time of `import main` measured with python -X importtime in fresh interpreters.
+
+    Fails (exit code 1) when the import exceeds the budget, or when a module which must stay lazy
+    (database drivers, crypto backends) is imported, or the engine is created, as an import side effect.
+
+    > cd app
+    > python -m benchmarks.import_time --budget-ms 1500
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from benchmarks.common import configure_database
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Loaded on first use (token, password hashing) or by the lifespan (engine and its driver)
+LAZY_MODULES = ("jose", "passlib", "bcrypt", "asyncpg", "psycopg2", "aiosqlite")
+
+IMPORT_MAIN = (
+    "import json, sys, main, database; "
+    "print(json.dumps({"
+    "'modules': [m for m in %r if m in sys.modules], "
+    "'engine_created': database.get_async_engine.cache_info().currsize > 0}))"
+) % (LAZY_MODULES,)
+
+IMPORT_TIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def measure() -> tuple[float, dict[str, int], dict]:
+    """ Import the app in a fresh interpreter
+
+    Returns:
+        tuple[float, dict[str, int], dict]: Import time of main in milliseconds, cumulative microseconds of
+            the top level imports of main, and the side effects found after the import
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", IMPORT_MAIN],
+        cwd=APP_DIR, capture_output=True, text=True, check=True
+    )
+    # A module is listed after its own imports: the imports of main are the ones listed since the previous top level module
+    imports, total, children = {}, None, {}
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match is None:
+            continue
+        cumulative, depth, name = int(match.group(2)), len(match.group(3)) // 2, match.group(4)
+        if depth == 1:
+            children[name] = cumulative
+        elif depth == 0:
+            if name == "main":
+                total, imports = cumulative / 1000, children
+            children = {}
+    return total, imports, json.loads(result.stdout)
+
+def main(repeat: int, budget_ms: float, top: int) -> int:
+    runs = [measure() for _ in range(repeat)]
+    total = statistics.median(run[0] for run in runs)
+    imports, side_effects = runs[-1][1], runs[-1][2]
+
+    print(f"import main: {total:.0f} ms (median of {repeat}, budget {budget_ms:.0f} ms)")
+    for name, cumulative in sorted(imports.items(), key=lambda item: item[1], reverse=True)[:top]:
+        print(f"{name:>34}: {cumulative / 1000:8.1f} ms")
+
+    failures = []
+    if total > budget_ms:
+        failures.append(f"import main took {total:.0f} ms, over the {budget_ms:.0f} ms budget")
+    if side_effects["modules"]:
+        failures.append(f"imported at startup instead of on first use: {', '.join(side_effects['modules'])}")
+    if side_effects["engine_created"]:
+        failures.append("the database engine is created at import time")
+    for failure in failures:
+        print(f"FAIL {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters, the median is reported")
+    parser.add_argument("--budget-ms", type=float, default=1500, help="Maximum import time of main")
+    parser.add_argument("--top", type=int, default=10, help="Number of imports of main listed")
+    args = parser.parse_args()
+    # The app modules read their settings at import time
+    configure_database()
+    sys.exit(main(args.repeat, args.budget_ms, args.top))
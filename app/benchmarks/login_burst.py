@@ -0,0 +1,77 @@
+""" Credential stuffing burst on POST /auth/token: wrong passwords for existing users from one client ip,
+    while another client logs in with valid credentials. Reports the bcrypt verifies run for the attacker,
+    the rejected attempts and the latency of the valid logins. Run it with and without the rate limiter.
+
+    > cd app
+    > python -m benchmarks.login_burst --attempts 500
+    > RATE_LIMIT_ENABLED=false python -m benchmarks.login_burst --attempts 500
+"""
+import argparse
+import asyncio
+import os
+import time
+from benchmarks.common import configure_database, create_schema, summarize
+
+# The rate limiter is what this benchmark measures, it is disabled by default for the other benchmarks
+os.environ.setdefault("RATE_LIMIT_ENABLED", "true")
+
+# The database must be configured before the app modules create their engines
+configure_database()
+
+import httpx
+from benchmarks.seed import PASSWORD, seed
+from database import get_async_engine
+from main import app
+from settings import RATE_LIMIT_ENABLED
+from utilities.password_hasher import password_hasher
+
+
+async def attack(user_names: list[str], attempts: int, concurrency: int) -> dict:
+    transport = httpx.ASGITransport(app=app, client=("203.0.113.10", 40000))
+    statuses: dict[int, int] = {}
+    remaining = iter(range(attempts))
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def worker():
+            for attempt in remaining:
+                response = await client.post("/auth/token", data={"username": user_names[attempt % len(user_names)], "password": "wrong"})
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return statuses
+
+async def log_in(user_names: list[str], logins: int) -> list[float]:
+    transport = httpx.ASGITransport(app=app, client=("198.51.100.20", 40000))
+    samples = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for i in range(logins):
+            started = time.perf_counter()
+            response = await client.post("/auth/token", data={"username": user_names[i % len(user_names)], "password": PASSWORD})
+            samples.append(time.perf_counter() - started)
+            assert response.status_code == 200, response.text
+    return samples
+
+async def main(users: int, attempts: int, concurrency: int, logins: int):
+    await create_schema()
+    data = await seed(1, users, 1)
+    user_names = data.admin_user_names + data.member_user_names
+    attacked, legit = user_names[:-1], user_names[-1:]
+    async with app.router.lifespan_context(app):
+        hashes_before = password_hasher.metrics()["completed_total"]
+        started = time.perf_counter()
+        statuses, samples = await asyncio.gather(attack(attacked, attempts, concurrency), log_in(legit, logins))
+        elapsed = time.perf_counter() - started
+        hashes = password_hasher.metrics()["completed_total"] - hashes_before - logins
+    await get_async_engine().dispose()
+    result = summarize(samples)
+    print(f"rate limiter: {'on' if RATE_LIMIT_ENABLED else 'off'}")
+    print(f"attempts: {attempts} in {elapsed:.2f}s, status codes {dict(sorted(statuses.items()))}, bcrypt verifies for the attacker: {hashes}")
+    print(f"valid logins: p50 {result['p50_ms']:.1f} ms, p95 {result['p95_ms']:.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20, help="Number of users, the last one logs in with valid credentials")
+    parser.add_argument("--attempts", type=int, default=500, help="Attempts with a wrong password")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--logins", type=int, default=10, help="Valid logins during the burst")
+    args = parser.parse_args()
+    asyncio.run(main(args.users, args.attempts, args.concurrency, args.logins))
@@ -0,0 +1,75 @@
+""" Task search: full text index (Postgres tsvector + GIN, SQLite FTS5) vs ILIKE scan, on a company of random tasks
+
+    > cd app
+    > python -m benchmarks.search --tasks 10000 100000
+"""
+import argparse
+import asyncio
+import random
+import time
+import uuid
+from benchmarks.common import configure_database, create_schema, summarize
+
+# The database must be configured before the app modules create their engines
+configure_database()
+
+from sqlalchemy import insert
+from database import get_async_engine, new_async_session
+from schemas.base_entity import Priority, TaskStatus
+from schemas.company import Company
+from schemas.task import Task
+from schemas.user import User
+from services import task as task_service
+
+WORDS = [f"{prefix}{suffix}" for prefix in ("deploy", "review", "backend", "invoice", "release", "customer", "migrate", "report")
+         for suffix in ("", "ed", "ment", "er", "s", "ing")] + [f"word{i}" for i in range(2000)]
+# A frequent word, a rare word, a prefix and two words
+QUERIES = ("deploy", "word1234", "custom", "release backend")
+
+
+def sentence(words: int) -> str:
+    return " ".join(random.choice(WORDS) for _ in range(words))
+
+async def seed_company(db, task_count: int) -> uuid.UUID:
+    company_id, user_id = uuid.uuid4(), uuid.uuid4()
+    await db.execute(insert(Company), [{"id": company_id, "name": f"Company {task_count}", "rating": 3}])
+    await db.execute(insert(User), [{"id": user_id, "email": f"{user_id}@bench", "user_name": str(user_id), "is_active": True, "is_admin": True, "company_id": company_id}])
+    for start in range(0, task_count, 5000):
+        tasks = [
+            {"id": uuid.uuid4(), "summary": sentence(4), "description": sentence(20), "status": TaskStatus.NEW, "priority": Priority.MEDIUM, "user_id": user_id}
+            for _ in range(min(5000, task_count - start))
+        ]
+        await db.execute(insert(Task), tasks)
+    await db.commit()
+    return company_id
+
+async def measure(method: str, q: str, company_id: uuid.UUID, limit: int, repeat: int) -> tuple[dict, int]:
+    samples = []
+    for _ in range(repeat):
+        async with new_async_session() as db:
+            started = time.perf_counter()
+            tasks = await task_service.search_tasks(q, db, company_id, limit=limit, method=method)
+            samples.append(time.perf_counter() - started)
+    return summarize(samples), len(tasks)
+
+async def main(sizes: list[int], limit: int, repeat: int):
+    random.seed(42)
+    await create_schema()
+    print(f"{'tasks':>8} {'query':>16} {'method':>9} {'found':>6} {'p50 ms':>9} {'p95 ms':>9}")
+    for size in sizes:
+        async with new_async_session() as db:
+            company_id = await seed_company(db, size)
+        for q in QUERIES:
+            for method in ("fulltext", "like"):
+                result, found = await measure(method, q, company_id, limit, repeat)
+                print(f"{size:>8} {q:>16} {method:>9} {found:>6} {result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f}")
+    await get_async_engine().dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, nargs="+", default=[10000, 100000], help="Number of tasks in the company")
+    parser.add_argument("--limit", type=int, default=50, help="Maximum number of tasks returned")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.tasks, args.limit, args.repeat))
@@ -0,0 +1,64 @@
+import random
+import uuid
+from dataclasses import dataclass, field
+from sqlalchemy import insert
+from database import new_async_session
+from schemas.base_entity import Priority, TaskStatus
+from schemas.company import Company
+from schemas.task import Task
+from schemas.user import User, get_hashed_password
+
+PASSWORD = "benchmark"
+BATCH_SIZE = 5000
+
+
+@dataclass
+class SeededData:
+    company_ids: list[uuid.UUID] = field(default_factory=list)
+    admin_user_names: list[str] = field(default_factory=list)
+    member_user_names: list[str] = field(default_factory=list)
+    task_count: int = 0
+
+
+async def _insert(db, entity, rows: list[dict]):
+    for start in range(0, len(rows), BATCH_SIZE):
+        await db.execute(insert(entity), rows[start:start + BATCH_SIZE])
+
+async def seed(companies: int, users_per_company: int, tasks_per_user: int) -> SeededData:
+    """ Insert a synthetic dataset: companies x users x tasks. The first user of each company is admin.
+        All users share the password PASSWORD, hashed once to keep seeding fast.
+
+    Args:
+        companies (int): Number of companies
+        users_per_company (int): Number of users in each company
+        tasks_per_user (int): Number of tasks of each user
+
+    Returns:
+        SeededData: Ids and user names to drive the benchmark with
+    """
+    data = SeededData()
+    hashed_password = get_hashed_password(PASSWORD)
+    statuses, priorities = list(TaskStatus), list(Priority)
+    async with new_async_session() as db:
+        for c in range(companies):
+            company_id = uuid.uuid4()
+            data.company_ids.append(company_id)
+            await _insert(db, Company, [{"id": company_id, "name": f"Company {c}", "description": f"Benchmark company {c}", "rating": random.randint(1, 5)}])
+            users = []
+            for u in range(users_per_company):
+                user_name = f"bench-{c}-{u}"
+                (data.admin_user_names if u == 0 else data.member_user_names).append(user_name)
+                users.append({
+                    "id": uuid.uuid4(), "email": f"{user_name}@bench", "user_name": user_name, "first_name": "Bench", "last_name": str(u),
+                    "hashed_password": hashed_password, "is_active": True, "is_admin": u == 0, "company_id": company_id
+                })
+            await _insert(db, User, users)
+            tasks = [
+                {"id": uuid.uuid4(), "summary": f"Task {t} of {user['user_name']}", "description": "Benchmark task",
+                 "status": random.choice(statuses), "priority": random.choice(priorities), "user_id": user["id"]}
+                for user in users for t in range(tasks_per_user)
+            ]
+            await _insert(db, Task, tasks)
+            data.task_count += len(tasks)
+        await db.commit()
+    return data
@@ -0,0 +1,84 @@
+""" Serialization of a large page of tasks: FastAPI response_model validation, dump and json.dumps (before)
+    vs json_response, validated once and dumped by pydantic-core, from ORM objects and from the column rows
+    the services return (after)
+
+    > cd app
+    > python -m benchmarks.serialization --rows 10000
+"""
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta
+from uuid import uuid4
+from benchmarks.common import configure_database
+
+# The database must be configured before the app modules create their engines
+configure_database()
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+import schemas.company  # registers the Company and User mappers used by Task.user
+from schemas.base_entity import Priority, TaskStatus
+from schemas.task import Task
+from models.pagination import PageViewModel
+from models.task import TaskViewModel
+from utilities.responses import json_response
+
+
+def build_page(rows: int) -> PageViewModel:
+    """ A page of transient Task ORM objects, as returned by the services """
+    user_id = uuid4()
+    started = datetime.now()
+    return PageViewModel(items=[
+        Task(id=uuid4(), summary=f"task {i}", description="benchmark task", status=TaskStatus.NEW,
+             priority=Priority.MEDIUM, user_id=user_id, created_at=started + timedelta(microseconds=i))
+        for i in range(rows)
+    ])
+
+def to_rows(page: PageViewModel) -> PageViewModel:
+    """ The same page as the dict rows selected by the services (see utilities.rows.fetch_rows) """
+    keys = TaskViewModel.model_fields.keys()
+    return PageViewModel(items=[{key: getattr(task, key) for key in keys} for task in page.items])
+
+async def fastapi_response(field, page: PageViewModel) -> bytes:
+    """ What FastAPI does with a route returning the page with a PageViewModel[TaskViewModel] return annotation """
+    content = await serialize_response(field=field, response_content=page, is_coroutine=True)
+    return JSONResponse(content).body
+
+async def fast_response(page: PageViewModel) -> bytes:
+    return json_response(PageViewModel[TaskViewModel], page).body
+
+async def measure(case, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await case()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+async def main(rows: int, repeat: int):
+    page = build_page(rows)
+    rows_page = to_rows(page)
+    field = create_response_field(name="Response_get_all_tasks", type_=PageViewModel[TaskViewModel], mode="serialization")
+    before = await fastapi_response(field, page)
+    after = await fast_response(page)
+    assert json.loads(before) == json.loads(after) == json.loads(await fast_response(rows_page))
+    cases = {
+        "return value + response_model": lambda: fastapi_response(field, page),
+        "json_response from ORM objects": lambda: fast_response(page),
+        "json_response from rows": lambda: fast_response(rows_page),
+    }
+    results = {name: await measure(case, repeat) for name, case in cases.items()}
+    baseline = results["return value + response_model"]
+    for name, seconds in results.items():
+        print(f"{name:>34}: {seconds * 1000:8.2f} ms for {rows} rows ({baseline / seconds:.1f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000, help="Tasks in the page")
+    parser.add_argument("--repeat", type=int, default=5, help="Measurements, the best one is reported")
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.repeat))
@@ -0,0 +1,52 @@
+""" Per request authentication overhead: jwt.decode + User ORM instance (before) vs the cached principal (after)
+
+    > cd app
+    > python -m benchmarks.token_interceptor --number 20000
+"""
+import argparse
+import timeit
+from datetime import timedelta
+from uuid import UUID, uuid4
+from benchmarks.common import configure_database
+
+# The database must be configured before the app modules create their engines
+configure_database()
+
+from jose import jwt
+import schemas.company  # registers the Company mapper used by User.company
+from schemas.user import User
+from services import auth as auth_service
+from settings import JWT_ALGORITHM, JWT_SECRET
+
+
+def decode_into_orm_user(token: str) -> User:
+    """ The token_interceptor implementation before the principal cache """
+    payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+    user = User()
+    user.user_name = payload.get("sub")
+    user.id = UUID(payload.get("id"))
+    user.first_name = payload.get("first_name")
+    user.last_name = payload.get("last_name")
+    user.is_admin = payload.get("is_admin")
+    user.is_active = payload.get("is_active")
+    user.company_id = UUID(payload.get("company_id"))
+    return user
+
+def main(number: int):
+    user = User(id=uuid4(), user_name="bench", first_name="Bench", last_name="Mark", is_admin=False, is_active=True, company_id=uuid4())
+    token, _ = auth_service.create_access_token(user, timedelta(minutes=10))
+    cases = {
+        "jwt.decode + User()": lambda: decode_into_orm_user(token),
+        "decode_token (no cache)": lambda: auth_service.decode_token(token),
+        "get_principal (cached)": lambda: auth_service.get_principal(token),
+    }
+    for name, case in cases.items():
+        seconds = min(timeit.repeat(case, number=number, repeat=5))
+        print(f"{name:>26}: {seconds / number * 1e6:8.2f} us/request")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=20000, help="Calls per measurement")
+    args = parser.parse_args()
+    main(args.number)
@@ -1,18 +1,178 @@
-from settings import SQLALCHEMY_DATABASE_URL
-from sqlalchemy import create_engine
+import asyncio
+import logging
+import time
+from contextlib import AsyncExitStack
+from contextvars import ContextVar
+from functools import cache
+from settings import (
+    SQLALCHEMY_ASYNC_DATABASE_URL,
+    DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_POOL_PRE_PING, DB_STATEMENT_TIMEOUT_MS
+)
+from sqlalchemy import event, make_url, text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from utilities.metrics import Histogram
+from utilities.sql_profiler import current_query_profile, get_call_site
 
-def get_db_context():
-    try:
-        db = LocalSession()
+async def get_async_db_context():
+    async with new_async_session() as db:
         yield db
-    finally:
-        db.close()
 
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
- 
-LocalSession = sessionmaker(autoflush=False, autocommit=False, bind=engine)
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """ Queue pool which records how long the checkouts wait for a connection """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkout_count = 0
+        self.checkout_wait_seconds_total = 0.0
+        self.checkout_wait_seconds_max = 0.0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - started
+            self.checkout_count += 1
+            self.checkout_wait_seconds_total += waited
+            self.checkout_wait_seconds_max = max(self.checkout_wait_seconds_max, waited)
+
+
+class QueryStats:
+    """ Number and duration of the queries run while serving a request """
+
+    __slots__ = ("count", "seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+
+# Set by the metrics middleware for the duration of each request
+current_query_stats: ContextVar[QueryStats | None] = ContextVar("current_query_stats", default=None)
+
+db_query_duration = Histogram("db_query_duration_seconds", "Duration of the database queries")
+
+
+def get_engine_options(url: str) -> dict:
+    """ Build the pool and connection options of the async engine from the settings
+
+    Args:
+        url (str): Database url of the engine
+
+    Returns:
+        dict: Keyword arguments for create_async_engine
+    """
+    options = {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING
+    }
+    database_url = make_url(url)
+    if DB_STATEMENT_TIMEOUT_MS > 0 and database_url.get_backend_name() == "postgresql":
+        if database_url.get_driver_name() == "asyncpg":
+            options["connect_args"] = {"server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}}
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"}
+    return options
+
+async def warm_up_pool(connections: int = DB_POOL_SIZE):
+    """ Open the pool connections before the worker accepts traffic, so the first requests do not pay for the connects
+
+    Args:
+        connections (int, optional): Connections to open. Defaults to DB_POOL_SIZE.
+    """
+    async with AsyncExitStack() as stack:
+        # Hold every connection until all are open, otherwise the pool would hand out the same one again
+        opened = [await stack.enter_async_context(get_async_engine().connect()) for _ in range(connections)]
+        await asyncio.gather(*(connection.execute(text("SELECT 1")) for connection in opened))
+
+async def ping_database(timeout: float) -> bool:
+    """ Check that a pooled connection can run a query within a timeout (the pool itself may be exhausted)
+
+    Args:
+        timeout (float): Seconds to wait for a connection and the query
+
+    Returns:
+        bool: True if the database answered in time
+    """
+    async def ping():
+        async with get_async_engine().connect() as connection:
+            await connection.execute(text("SELECT 1"))
+    try:
+        await asyncio.wait_for(ping(), timeout)
+        return True
+    except Exception as e:
+        logging.error(f"The database could not be reached. {e}")
+        return False
+
+def get_pool_metrics() -> dict:
+    """ Snapshot of the async connection pool
+
+    Returns:
+        dict: Pool size, connections in use, overflow and checkout wait time
+    """
+    pool = get_async_engine().pool
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": DB_MAX_OVERFLOW,
+        "checkout_count": pool.checkout_count,
+        "checkout_wait_seconds_total": pool.checkout_wait_seconds_total,
+        "checkout_wait_seconds_avg": pool.checkout_wait_seconds_total / pool.checkout_count if pool.checkout_count else 0.0,
+        "checkout_wait_seconds_max": pool.checkout_wait_seconds_max
+    }
+
+
+@cache
+def get_async_engine() -> AsyncEngine:
+    """ The async engine of the app. It is created on first use (the lifespan startup of a worker),
+        so importing the app neither loads the database driver nor builds the pool.
+    """
+    async_engine = create_async_engine(
+        SQLALCHEMY_ASYNC_DATABASE_URL,
+        poolclass=InstrumentedAsyncQueuePool,
+        **get_engine_options(SQLALCHEMY_ASYNC_DATABASE_URL)
+    )
+    if async_engine.dialect.name == "sqlite":
+        event.listen(async_engine.sync_engine, "connect", enable_sqlite_foreign_keys)
+    event.listen(async_engine.sync_engine, "before_cursor_execute", start_query_timer)
+    event.listen(async_engine.sync_engine, "after_cursor_execute", record_query)
+    return async_engine
+
+def enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    # The write paths rely on foreign keys to detect missing rows, SQLite only enforces them on demand
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    context.query_started = time.perf_counter()
+
+def record_query(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context.query_started
+    db_query_duration.observe(elapsed)
+    stats = current_query_stats.get()
+    if stats is not None:
+        stats.count += 1
+        stats.seconds += elapsed
+    profile = current_query_profile.get()
+    if profile is not None:
+        profile.record(statement, elapsed, get_call_site())
+
+@cache
+def _get_async_sessionmaker() -> async_sessionmaker:
+    return async_sessionmaker(get_async_engine(), autoflush=False, autocommit=False, expire_on_commit=False, class_=AsyncSession)
+
+def new_async_session() -> AsyncSession:
+    """ New session on the async engine, e.g. async with new_async_session() as db: ... """
+    return _get_async_sessionmaker()()
+
 
-Base = declarative_base()
\ No newline at end of file
+Base = declarative_base()
@@ -0,0 +1,65 @@
+import logging
+from contextlib import asynccontextmanager
+from uuid import UUID
+from fastapi import FastAPI
+from database import get_async_engine, new_async_session, warm_up_pool
+from schemas.user import load_password_hashing
+from services import auth as auth_service, company as company_service, task as task_service, user as user_service
+from settings import DB_WARM_UP_CONNECTIONS
+from utilities.pubsub import pubsub
+
+NIL_UUID = UUID(int=0)
+
+
+class LifespanState:
+    """ Startup/shutdown state of the worker, read by the health endpoints """
+
+    def __init__(self):
+        self.started = False
+        self.shutting_down = False
+
+
+state = LifespanState()
+
+
+async def warm_up_queries():
+    """ Run the hot reads once with ids which match nothing. SQLAlchemy compiles and caches their SQL for the engine,
+        and the driver prepares the statements on the connection used, so the first real requests skip that work.
+    """
+    async with new_async_session() as db:
+        await auth_service.authenticate("", "", db)
+        await company_service.get_all_company(db)
+        await company_service.get_company_by_id(NIL_UUID, db)
+        await user_service.get_user_by_id(NIL_UUID, db)
+        await user_service.get_users_by_company_id(NIL_UUID, db)
+        await task_service.get_task_by_id(NIL_UUID, NIL_UUID, True, db)
+        await task_service.get_task_by_id(NIL_UUID, NIL_UUID, False, db)
+        await task_service.get_tasks_by_user_id(NIL_UUID, db)
+        await task_service.get_tasks_by_company_id(NIL_UUID, db)
+
+def begin_shutdown():
+    """ Report the worker as shutting down, GET /health/ready returns 503 from now on, and end the event streams.
+        serve.py calls it on SIGTERM, while uvicorn still accepts connections: the load balancer sees the worker
+        is not ready and stops routing to it before uvicorn closes the socket and waits for the open connections.
+    """
+    state.shutting_down = True
+    # The event streams never complete on their own, they would hold the wait until its timeout.
+    # Their clients get a shutdown event (WebSocket: 1001) and reconnect to another worker
+    pubsub.close_subscriptions()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm up the worker before it accepts traffic, so a deployment does not cause a latency spike
+    load_password_hashing()
+    try:
+        await warm_up_pool(DB_WARM_UP_CONNECTIONS)
+        await warm_up_queries()
+    except Exception as e:
+        # The pool still connects on demand, the readiness check reports the database health
+        logging.error(f"There is an error while warming up the database connections. {e}")
+    state.started = True
+    yield
+    # uvicorn has already waited for the open connections (up to SHUTDOWN_DRAIN_SECONDS)
+    begin_shutdown()
+    await pubsub.close()
+    await get_async_engine().dispose()
@@ -1,12 +1,36 @@
 from fastapi import FastAPI
 import uvicorn
-from routers import company, user, task, auth
-app = FastAPI()
+from lifespan import lifespan
+from routers import company, user, task, auth, metrics, health
+from middlewares.metrics import MetricsMiddleware
+from middlewares.rate_limit import RateLimitMiddleware
+from middlewares.sql_profiler import SqlProfilerMiddleware
+from utilities.rate_limit import create_rate_limit_backend, parse_rate
+from settings import (
+    SQL_PROFILE, SQL_PROFILE_REPEAT_THRESHOLD, RATE_LIMIT_ENABLED, RATE_LIMIT_BACKEND, RATE_LIMIT_URL, RATE_LIMIT_MAX_KEYS,
+    RATE_LIMIT_LOGIN_IP, RATE_LIMIT_LOGIN_USER, RATE_LIMIT_USER
+)
+app = FastAPI(lifespan=lifespan)
+
+if SQL_PROFILE:
+    app.add_middleware(SqlProfilerMiddleware, repeat_threshold=SQL_PROFILE_REPEAT_THRESHOLD)
+if RATE_LIMIT_ENABLED:
+    app.add_middleware(
+        RateLimitMiddleware,
+        backend=create_rate_limit_backend(RATE_LIMIT_BACKEND, RATE_LIMIT_URL, RATE_LIMIT_MAX_KEYS),
+        login_ip_rate=parse_rate(RATE_LIMIT_LOGIN_IP),
+        login_user_rate=parse_rate(RATE_LIMIT_LOGIN_USER),
+        user_rate=parse_rate(RATE_LIMIT_USER)
+    )
+# Added last, so it is the outermost middleware and also records the rejected requests
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(auth.router)
 app.include_router(company.router)
 app.include_router(user.router)
 app.include_router(task.router)
+app.include_router(metrics.router)
+app.include_router(health.router)
 
 @app.get("/")
 async def health_check():
@@ -0,0 +1,55 @@
+import time
+from database import QueryStats, current_query_stats
+from utilities.metrics import Counter, Gauge, Histogram
+
+# Requests which do not match any route share one label, so unknown paths cannot explode the series
+UNMATCHED_ROUTE = "<unmatched>"
+
+http_requests = Counter("http_requests_total", "Requests by method, route and status code", ("method", "route", "status"))
+http_request_duration = Histogram("http_request_duration_seconds", "Request latency by method and route", ("method", "route"))
+http_requests_in_flight = Gauge("http_requests_in_flight", "Requests being served")
+db_queries_per_request = Histogram(
+    "http_request_db_queries", "Database queries per request by route", ("method", "route"),
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100)
+)
+db_time_per_request = Histogram("http_request_db_seconds", "Database time per request by route", ("method", "route"))
+
+
+class MetricsMiddleware:
+    """ Pure ASGI middleware recording the latency, status code and database usage of each request,
+        labelled by the route template (e.g. /tasks/{id}) rather than the raw path.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        stats = QueryStats()
+        token = current_query_stats.set(stats)
+        http_requests_in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            http_requests_in_flight.dec()
+            current_query_stats.reset(token)
+            method = scope["method"]
+            # The router stores the matched route in the scope
+            route = scope.get("route")
+            path = route.path_format if route is not None else UNMATCHED_ROUTE
+            http_requests.inc(method, path, status_code)
+            http_request_duration.observe(elapsed, method, path)
+            db_queries_per_request.observe(stats.count, method, path)
+            db_time_per_request.observe(stats.seconds, method, path)
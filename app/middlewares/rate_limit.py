@@ -0,0 +1,142 @@
+import logging
+import math
+from fastapi import HTTPException, status
+from fastapi.requests import HTTPConnection, Request
+from fastapi.responses import JSONResponse
+from starlette.routing import Match
+from services.auth import get_connection_principal
+from utilities.metrics import Counter
+from utilities.rate_limit import Rate, RateLimitBackend
+
+LOGIN_PATH = "/auth/token"
+# Routes limited per logged user (per client ip without a valid token)
+USER_LIMITED_PREFIXES = ("/tasks", "/users")
+# A login form is a few hundred bytes, a larger body is not buffered
+MAX_LOGIN_BODY_SIZE = 4096
+
+rate_limited_requests = Counter("http_requests_rate_limited_total", "Requests rejected by the rate limiter by bucket", ("bucket",))
+
+
+class RateLimitMiddleware:
+    """ Pure ASGI middleware applying token buckets before the request reaches the routes, so a rejected request
+        costs neither a database query nor a bcrypt verify. Rejected requests get 429 Too Many Requests with Retry-After.
+        - POST /auth/token: a bucket per client ip, checked before reading the body, then a bucket per username
+          (the form is buffered, parsed and replayed to the route)
+        - /tasks and /users: a bucket per logged user
+        A bucket whose rate is None is not applied. When the backend fails the requests are let through.
+    """
+
+    def __init__(self, app, backend: RateLimitBackend, login_ip_rate: Rate = None, login_user_rate: Rate = None, user_rate: Rate = None):
+        self.app = app
+        self.backend = backend
+        self.login_ip_rate = login_ip_rate
+        self.login_user_rate = login_user_rate
+        self.user_rate = user_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        client_ip = scope["client"][0] if scope.get("client") else "unknown"
+        if path == LOGIN_PATH and scope["method"] == "POST":
+            wait = await self._acquire("login_ip", f"login:ip:{client_ip}", self.login_ip_rate)
+            if wait:
+                await self._reject(wait, scope, receive, send)
+                return
+            if self.login_user_rate is not None:
+                body = await self._read_body(receive)
+                if body is None:
+                    _set_route(scope)
+                    await JSONResponse({"detail": "Request body too large"}, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)(scope, receive, send)
+                    return
+                receive = self._replay(body, receive)
+                username = await self._get_username(scope, body)
+                if username:
+                    wait = await self._acquire("login_user", f"login:user:{username}", self.login_user_rate)
+                    if wait:
+                        await self._reject(wait, scope, receive, send)
+                        return
+        elif self.user_rate is not None and any(path == prefix or path.startswith(f"{prefix}/") for prefix in USER_LIMITED_PREFIXES):
+            try:
+                key = f"user:{get_connection_principal(HTTPConnection(scope)).id}"
+            except HTTPException:
+                # The route answers 401, the client is limited by its ip meanwhile
+                key = f"user:ip:{client_ip}"
+            wait = await self._acquire("user", key, self.user_rate)
+            if wait:
+                await self._reject(wait, scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+    async def _acquire(self, bucket: str, key: str, rate: Rate | None) -> float:
+        if rate is None:
+            return 0
+        try:
+            wait = await self.backend.acquire(key, rate)
+        except Exception as e:
+            logging.error(f"There is an error while checking the rate limit of {key}. {e}")
+            return 0
+        if wait:
+            rate_limited_requests.inc(bucket)
+        return wait
+
+    async def _reject(self, wait: float, scope, receive, send):
+        _set_route(scope)
+        response = JSONResponse(
+            {"detail": "Too many requests"},
+            status.HTTP_429_TOO_MANY_REQUESTS,
+            headers={"Retry-After": str(math.ceil(wait))}
+        )
+        await response(scope, receive, send)
+
+    async def _read_body(self, receive) -> bytes | None:
+        # None in case the body is larger than MAX_LOGIN_BODY_SIZE
+        chunks, size = [], 0
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                break
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if size > MAX_LOGIN_BODY_SIZE:
+                return None
+            chunks.append(chunk)
+            if not message.get("more_body", False):
+                break
+        return b"".join(chunks)
+
+    def _replay(self, body: bytes, receive):
+        # The route reads the buffered body, then the original receive (e.g. the disconnect)
+        replayed = False
+        async def replay_receive():
+            nonlocal replayed
+            if replayed:
+                return await receive()
+            replayed = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return replay_receive
+
+    async def _get_username(self, scope, body: bytes) -> str | None:
+        # Same parsing as OAuth2PasswordRequestForm (urlencoded or multipart)
+        try:
+            form = await Request(scope, self._replay(body, _no_more_messages)).form()
+            username = form.get("username")
+        except Exception:
+            return None
+        if not isinstance(username, str):
+            return None
+        return username.strip().lower()[:256] or None
+
+
+def _set_route(scope):
+    # The request does not reach the router: the route is resolved for the metrics, only when it is rejected
+    for route in scope["app"].router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            scope["route"] = route
+            return
+
+async def _no_more_messages():
+    return {"type": "http.disconnect"}
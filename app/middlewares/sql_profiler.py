@@ -0,0 +1,45 @@
+import logging
+from utilities.sql_profiler import QueryProfile, current_query_profile
+
+
+class SqlProfilerMiddleware:
+    """ Debug middleware (SQL_PROFILE=true) profiling the statements of each request.
+        The summary is sent in the X-Query-Count, X-Query-Time-Ms and X-Query-Repeated headers and logged;
+        identical statements run repeat_threshold times or more (likely an N+1) are logged with their call sites.
+    """
+
+    def __init__(self, app, repeat_threshold: int = 2):
+        self.app = app
+        self.repeat_threshold = repeat_threshold
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = QueryProfile(current_query_profile.get())
+        async def send_with_summary(message):
+            if message["type"] == "http.response.start":
+                # Statements run after the headers (streamed bodies) are only in the log line
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-query-count", str(profile.count).encode()),
+                    (b"x-query-time-ms", f"{profile.seconds * 1000:.2f}".encode()),
+                    (b"x-query-repeated", str(len(profile.repeated(self.repeat_threshold))).encode())
+                ]
+            await send(message)
+
+        token = current_query_profile.set(profile)
+        try:
+            await self.app(scope, receive, send_with_summary)
+        finally:
+            current_query_profile.reset(token)
+            request = f"{scope['method']} {scope['path']}"
+            logging.info(f"{request}: {profile.count} queries in {profile.seconds * 1000:.1f} ms")
+            repeated = profile.repeated(self.repeat_threshold)
+            if repeated:
+                call_sites = {statement: {site for s, _, site in profile.statements if s == statement} for statement in repeated}
+                for statement, count in repeated.items():
+                    logging.warning(
+                        f"{request}: statement repeated {count} times (N+1?) at {', '.join(sorted(call_sites[statement]))}: "
+                        f"{' '.join(statement.split())}"
+                    )
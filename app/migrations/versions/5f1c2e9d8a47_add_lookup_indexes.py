@@ -0,0 +1,69 @@
+"""add lookup indexes
+
+Revision ID: 5f1c2e9d8a47
+Revises: c70649a28877
+Create Date: 2026-10-18 09:12:31.518207
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5f1c2e9d8a47'
+down_revision: Union[str, None] = 'c70649a28877'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def drop_invalid_index(index_name: str) -> None:
+    # A failed or interrupted CREATE INDEX CONCURRENTLY leaves an INVALID index behind, which IF NOT EXISTS would keep
+    invalid = op.get_bind().execute(
+        sa.text("SELECT 1 FROM pg_index WHERE indexrelid = to_regclass(:name) AND NOT indisvalid"),
+        {"name": index_name}
+    ).scalar()
+    if invalid:
+        op.drop_index(index_name, postgresql_concurrently=True)
+
+
+def check_unique(table_name: str, column_name: str) -> None:
+    duplicates = op.get_bind().execute(
+        sa.text(f"SELECT {column_name} FROM {table_name} GROUP BY {column_name} HAVING count(*) > 1 LIMIT 10")
+    ).scalars().all()
+    if duplicates:
+        raise RuntimeError(
+            f"Can not create the unique index on {table_name}.{column_name}, these values are duplicated: "
+            f"{', '.join(map(str, duplicates))}. Fix the data and run the migration again"
+        )
+
+
+def upgrade() -> None:
+    check_unique('users', 'email')
+    check_unique('users', 'user_name')
+    # CONCURRENTLY cannot run inside a transaction, and it keeps the tables writable while building
+    with op.get_context().autocommit_block():
+        for index_name in ('ix_tasks_user_id_created_at', 'ix_tasks_created_at_id', 'ix_users_company_id_is_active',
+                           'uq_users_email', 'uq_users_user_name', 'ix_companies_created_at_id'):
+            drop_invalid_index(index_name)
+        # Owner task listing: WHERE user_id = ? ORDER BY created_at, id
+        op.create_index('ix_tasks_user_id_created_at', 'tasks', ['user_id', 'created_at', 'id'], postgresql_concurrently=True, if_not_exists=True)
+        # Company task listing (tasks JOIN users) walks the tasks in (created_at, id) order
+        op.create_index('ix_tasks_created_at_id', 'tasks', ['created_at', 'id'], postgresql_concurrently=True, if_not_exists=True)
+        # Company user listing: WHERE company_id = ? AND is_active ORDER BY created_at, id
+        op.create_index('ix_users_company_id_is_active', 'users', ['company_id', 'is_active', 'created_at', 'id'], postgresql_concurrently=True, if_not_exists=True)
+        # Login lookup and conflict detection, enforced by the database instead of the model only
+        op.create_index('uq_users_email', 'users', ['email'], unique=True, postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('uq_users_user_name', 'users', ['user_name'], unique=True, postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_companies_created_at_id', 'companies', ['created_at', 'id'], postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_companies_created_at_id', table_name='companies', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('uq_users_user_name', table_name='users', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('uq_users_email', table_name='users', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_users_company_id_is_active', table_name='users', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_tasks_created_at_id', table_name='tasks', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_tasks_user_id_created_at', table_name='tasks', postgresql_concurrently=True, if_exists=True)
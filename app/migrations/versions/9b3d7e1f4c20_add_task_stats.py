@@ -0,0 +1,74 @@
+"""add task stats
+
+Revision ID: 9b3d7e1f4c20
+Revises: 5f1c2e9d8a47
+Create Date: 2026-10-18 14:05:12.204871
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b3d7e1f4c20'
+down_revision: Union[str, None] = '5f1c2e9d8a47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Statement level triggers: a bulk write of 1000 tasks upserts one row per (user, status, priority) it touches,
+# in a stable order so concurrent writers lock the summary rows in the same order
+APPLY_TASK_STATS = """
+CREATE FUNCTION apply_task_stats() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO task_stats (user_id, status, priority, count)
+        SELECT user_id, status, priority, count(*) FROM new_tasks
+        GROUP BY user_id, status, priority ORDER BY user_id, status, priority
+        ON CONFLICT (user_id, status, priority) DO UPDATE SET count = task_stats.count + EXCLUDED.count;
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO task_stats (user_id, status, priority, count)
+        SELECT user_id, status, priority, -count(*) FROM old_tasks
+        GROUP BY user_id, status, priority ORDER BY user_id, status, priority
+        ON CONFLICT (user_id, status, priority) DO UPDATE SET count = task_stats.count + EXCLUDED.count;
+    ELSE
+        INSERT INTO task_stats (user_id, status, priority, count)
+        SELECT user_id, status, priority, sum(delta) FROM (
+            SELECT user_id, status, priority, 1 AS delta FROM new_tasks
+            UNION ALL
+            SELECT user_id, status, priority, -1 AS delta FROM old_tasks
+        ) AS changes
+        GROUP BY user_id, status, priority HAVING sum(delta) <> 0 ORDER BY user_id, status, priority
+        ON CONFLICT (user_id, status, priority) DO UPDATE SET count = task_stats.count + EXCLUDED.count;
+    END IF;
+    RETURN NULL;
+END
+$$
+"""
+
+
+def upgrade() -> None:
+    op.create_table("task_stats",
+                    sa.Column('user_id', sa.UUID, sa.ForeignKey('users.id'), nullable=False),
+                    sa.Column('status', postgresql.ENUM(name='taskstatus', create_type=False), nullable=False),
+                    sa.Column('priority', postgresql.ENUM(name='priority', create_type=False), nullable=False),
+                    sa.Column('count', sa.Integer, nullable=False, server_default='0'),
+                    sa.PrimaryKeyConstraint('user_id', 'status', 'priority')
+                    )
+    op.execute(APPLY_TASK_STATS)
+    op.execute("CREATE TRIGGER task_stats_insert AFTER INSERT ON tasks REFERENCING NEW TABLE AS new_tasks FOR EACH STATEMENT EXECUTE FUNCTION apply_task_stats()")
+    op.execute("CREATE TRIGGER task_stats_update AFTER UPDATE ON tasks REFERENCING OLD TABLE AS old_tasks NEW TABLE AS new_tasks FOR EACH STATEMENT EXECUTE FUNCTION apply_task_stats()")
+    op.execute("CREATE TRIGGER task_stats_delete AFTER DELETE ON tasks REFERENCING OLD TABLE AS old_tasks FOR EACH STATEMENT EXECUTE FUNCTION apply_task_stats()")
+    # The triggers lock out the task writes until the migration commits, so the backfill cannot miss or double count a write
+    op.execute("INSERT INTO task_stats (user_id, status, priority, count) SELECT user_id, status, priority, count(*) FROM tasks GROUP BY user_id, status, priority")
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER task_stats_delete ON tasks")
+    op.execute("DROP TRIGGER task_stats_update ON tasks")
+    op.execute("DROP TRIGGER task_stats_insert ON tasks")
+    op.execute("DROP FUNCTION apply_task_stats()")
+    op.drop_table('task_stats')
@@ -0,0 +1,35 @@
+"""add task search
+
+Revision ID: a4e8c2d61b9f
+Revises: 9b3d7e1f4c20
+Create Date: 2026-10-18 16:40:27.913054
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4e8c2d61b9f'
+down_revision: Union[str, None] = '9b3d7e1f4c20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Words of the summary (weight A) and of the description (weight B), not stemmed ('simple') so a prefix of the typed word matches.
+    # Adding a stored generated column rewrites the table
+    op.execute(
+        "ALTER TABLE tasks ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('simple', coalesce(summary, '')), 'A') || "
+        "setweight(to_tsvector('simple', coalesce(description, '')), 'B')) STORED"
+    )
+    with op.get_context().autocommit_block():
+        op.create_index('ix_tasks_search_vector', 'tasks', ['search_vector'], postgresql_using='gin', postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_tasks_search_vector', table_name='tasks', postgresql_concurrently=True, if_exists=True)
+    op.drop_column('tasks', 'search_vector')
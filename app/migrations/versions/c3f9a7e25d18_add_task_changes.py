@@ -0,0 +1,40 @@
+"""add task changes
+
+Revision ID: c3f9a7e25d18
+Revises: a4e8c2d61b9f
+Create Date: 2026-10-18 18:12:44.518302
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3f9a7e25d18'
+down_revision: Union[str, None] = 'a4e8c2d61b9f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Append-only: no foreign key to the task, whose changes outlive it
+    op.create_table("task_changes",
+                    sa.Column('seq', sa.BigInteger, primary_key=True, autoincrement=True),
+                    sa.Column('txid', sa.BigInteger, nullable=False, server_default='0'),
+                    sa.Column('task_id', sa.UUID, nullable=False),
+                    sa.Column('user_id', sa.UUID, nullable=False),
+                    sa.Column('company_id', sa.UUID, nullable=False),
+                    sa.Column('op', sa.Enum('INSERT', 'UPDATE', 'DELETE', name='changeoperation'), nullable=False),
+                    sa.Column('changed_at', sa.DateTime, nullable=False)
+                    )
+    op.create_index('ix_task_changes_company_id_txid_seq', 'task_changes', ['company_id', 'txid', 'seq'])
+    op.create_index('ix_task_changes_user_id_txid_seq', 'task_changes', ['user_id', 'txid', 'seq'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_task_changes_user_id_txid_seq', table_name='task_changes')
+    op.drop_index('ix_task_changes_company_id_txid_seq', table_name='task_changes')
+    op.drop_table('task_changes')
+    op.execute("DROP TYPE changeoperation")
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from uuid import UUID
 from datetime import datetime
 
@@ -8,8 +8,7 @@ class CompapnyViewModel(BaseModel):
     description: str
     rating: float
     created_at: datetime | None = None
-    class Config:
-        orm_mode: True
+    model_config = ConfigDict(from_attributes=True)
         
         
 class CompanyCreateOrUpdateModel(BaseModel):
@@ -0,0 +1,11 @@
+from typing import Generic, TypeVar
+from pydantic import BaseModel
+
+T = TypeVar("T")
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+class PageViewModel(BaseModel, Generic[T]):
+    items: list[T]
+    next_cursor: str | None = None
@@ -1,8 +1,8 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from uuid import UUID
 from datetime import datetime
 
-from schemas.base_entity import Priority, TaskStatus
+from schemas.base_entity import ChangeOperation, Priority, TaskStatus
 
 class TaskViewModel(BaseModel):
     id: UUID
@@ -12,13 +12,38 @@ class TaskViewModel(BaseModel):
     priority: Priority
     user_id: UUID
     created_at: datetime
-    class Config:
-        orm_mode: True
+    model_config = ConfigDict(from_attributes=True)
+
+class TaskSearchViewModel(TaskViewModel):
+    rank: float
 
 class TaskCreateOrUpdateModel(BaseModel):
     summary: str = Field()
     description: str = Field()
     status: TaskStatus = Field(default=TaskStatus.NEW)
     priority: Priority = Field(default=Priority.MEDIUM)
-    
-    
\ No newline at end of file
+
+class TaskBulkUpdateModel(TaskCreateOrUpdateModel):
+    id: UUID = Field()
+
+class BulkItemResultModel(BaseModel):
+    index: int
+    id: UUID | None = None
+    status_code: int
+    detail: str | None = None
+
+class TaskStatsViewModel(BaseModel):
+    total: int
+    by_status: dict[TaskStatus, int]
+    by_priority: dict[Priority, int]
+
+class TaskChangeViewModel(BaseModel):
+    op: ChangeOperation
+    task_id: UUID
+    changed_at: datetime
+    task: TaskViewModel | None = None
+
+class TaskChangesViewModel(BaseModel):
+    items: list[TaskChangeViewModel]
+    next_cursor: str
+    has_more: bool = False
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from uuid import UUID
 
 class UserViewModel(BaseModel):
@@ -10,8 +10,7 @@ class UserViewModel(BaseModel):
     is_admin: bool
     company_id: UUID
     email: str
-    class Config:
-        orm_mode: True
+    model_config = ConfigDict(from_attributes=True)
     
 
 class UserCreateOrUpdateModel(BaseModel):
@@ -1,52 +1,64 @@
 from uuid import UUID
-from fastapi import APIRouter, status, Depends
+from fastapi import APIRouter, Query, Request, Response, status, Depends
 from utilities.utils import http_exception
+from utilities.responses import json_response
+from utilities.conditional import etag_headers, get_etag, is_not_modified, not_modified_response
 from services import company as company_service
 from models.company import CompanyCreateOrUpdateModel, CompapnyViewModel
-from sqlalchemy.orm import Session
-from database import get_db_context
+from models.pagination import PageViewModel, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db_context
 
 
 router = APIRouter(prefix="/companies", tags=["Company"])
 
-@router.get("", status_code=status.HTTP_200_OK)
-async def get_all_companies(db: Session = Depends(get_db_context)) -> list[CompapnyViewModel]:
-    """ Get all companies
+@router.get("", status_code=status.HTTP_200_OK, response_model=PageViewModel[CompapnyViewModel])
+async def get_all_companies(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    db: AsyncSession = Depends(get_async_db_context)) -> Response:
+    """ Get a page of companies
 
     Args:
-        db (Session, optional): Db conext. Defaults to Depends(get_db_context).
+        limit (int, optional): Page size. Defaults to DEFAULT_PAGE_SIZE.
+        cursor (str | None, optional): next_cursor of the previous page. Defaults to None.
+        db (AsyncSession, optional): Db conext. Defaults to Depends(get_async_db_context).
 
     Returns:
-        list[CompapnyViewModel]: List of companies
+        Response: A page of companies (PageViewModel[CompapnyViewModel])
     """
-    return company_service.get_all_company(db)
+    return json_response(PageViewModel[CompapnyViewModel], await company_service.get_all_company(db, limit, cursor))
 
-@router.get("/{id}", status_code=status.HTTP_200_OK)
-async def get_company_by_id(id: UUID, db: Session = Depends(get_db_context))-> CompapnyViewModel:
-    """ Get comanpy by Id
+@router.get("/{id}", status_code=status.HTTP_200_OK, response_model=CompapnyViewModel, responses={status.HTTP_304_NOT_MODIFIED: {"description": "Not modified"}})
+async def get_company_by_id(id: UUID, request: Request, db: AsyncSession = Depends(get_async_db_context))-> Response:
+    """ Get comanpy by Id. The response has an ETag: a request with If-None-Match gets 304 Not modified until the company changes.
 
     Args:
         id (UUID): Id of the company
-        db (Session, optional): Db context. Defaults to Depends(get_db_context).
+        request (Request): The request
+        db (AsyncSession, optional): Db context. Defaults to Depends(get_async_db_context).
 
     Raises:
         http_exception: 404 error
 
     Returns:
-        CompapnyViewModel: Company model
+        Response: Company model, or 304 Not modified
     """
-    company = company_service.get_company_by_id(id, db)
+    etag = await get_etag(request, f"company:{id}")
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+    company = await company_service.get_company_by_id(id, db)
     if not company:
         raise http_exception(404, "Company not found")
-    return company
+    return json_response(CompapnyViewModel, company, headers=etag_headers(etag))
 
 @router.post("", status_code=status.HTTP_201_CREATED)
-async def create_new_company(model: CompanyCreateOrUpdateModel, db: Session = Depends(get_db_context)) -> bool:
+async def create_new_company(model: CompanyCreateOrUpdateModel, db: AsyncSession = Depends(get_async_db_context)) -> bool:
     """ Create a new Company
 
     Args:
         model (CompanyCreateOrUpdateModel): Company to create
-        db (Session, optional): Db context. Defaults to Depends(get_db_context).
+        db (AsyncSession, optional): Db context. Defaults to Depends(get_async_db_context).
 
     Raises:
         http_exception: 500 internal error
@@ -54,7 +66,7 @@ async def create_new_company(model: CompanyCreateOrUpdateModel, db: Session = De
     Returns:
         bool: True if success else False
     """
-    result = company_service.create_or_update_company(model, db)
+    result = await company_service.create_or_update_company(model, db)
     match result:
         case status.HTTP_500_INTERNAL_SERVER_ERROR:
             raise http_exception(500, "There was an error while creating Company")
@@ -62,13 +74,13 @@ async def create_new_company(model: CompanyCreateOrUpdateModel, db: Session = De
             return True
 
 @router.put("/{id}", status_code=status.HTTP_200_OK)
-async def create_new_company(id: UUID, model: CompanyCreateOrUpdateModel, db: Session = Depends(get_db_context)) -> bool:
+async def create_new_company(id: UUID, model: CompanyCreateOrUpdateModel, db: AsyncSession = Depends(get_async_db_context)) -> bool:
     """ Update a company
 
     Args:
         id (UUID): Company Id to update
         model (CompanyCreateOrUpdateModel): Company to edit
-        db (Session, optional): Db context. Defaults to Depends(get_db_context).
+        db (AsyncSession, optional): Db context. Defaults to Depends(get_async_db_context).
 
     Raises:
         http_exception: 500 internal error
@@ -76,7 +88,7 @@ async def create_new_company(id: UUID, model: CompanyCreateOrUpdateModel, db: Se
     Returns:
         bool: True if success else False
     """
-    result = company_service.create_or_update_company(model, db, id)
+    result = await company_service.create_or_update_company(model, db, id)
     match result:
         case status.HTTP_404_NOT_FOUND:
             raise http_exception(404, "The company could not be found to update")
@@ -86,12 +98,12 @@ async def create_new_company(id: UUID, model: CompanyCreateOrUpdateModel, db: Se
             raise http_exception(500, "There was an error while updating Company")
 
 @router.delete("/{id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_a_copany(id: UUID, db: Session = Depends(get_db_context)) -> None:
+async def delete_a_copany(id: UUID, db: AsyncSession = Depends(get_async_db_context)) -> None:
     """ Delete a company
 
     Args:
         id (UUID): Id of the company to delete
-        db (Session, optional): Db context. Defaults to Depends(get_db_context).
+        db (AsyncSession, optional): Db context. Defaults to Depends(get_async_db_context).
 
     Raises:
         http_exception: 404 error if the company could not be found to delete
@@ -99,7 +111,7 @@ async def delete_a_copany(id: UUID, db: Session = Depends(get_db_context)) -> No
     Returns:
         bool: True if success else False
     """
-    result = company_service.delete_a_company(id, db)
+    result = await company_service.delete_a_company(id, db)
     match result:
         case status.HTTP_204_NO_CONTENT:
             return status.HTTP_204_NO_CONTENT
@@ -0,0 +1,33 @@
+from fastapi import APIRouter, Response, status
+from database import get_pool_metrics, ping_database
+from lifespan import state
+from settings import HEALTH_CHECK_TIMEOUT_SECONDS
+
+router = APIRouter(prefix="/health", tags=["Health"])
+
+@router.get("/live", status_code=status.HTTP_200_OK)
+async def live() -> dict:
+    """ Liveness: the worker is running and its event loop answers. It does not touch the database
+
+    Returns:
+        dict: The status
+    """
+    return {"status": "alive"}
+
+@router.get("/ready", status_code=status.HTTP_200_OK)
+async def ready(response: Response) -> dict:
+    """ Readiness: the worker is warmed up, not shutting down, and the pool can run a query in time
+
+    Args:
+        response (Response): Response, its status code is set to 503 when not ready
+
+    Returns:
+        dict: The status and the pool metrics
+    """
+    if not state.started or state.shutting_down:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+        return {"status": "shutting down" if state.shutting_down else "starting"}
+    if not await ping_database(HEALTH_CHECK_TIMEOUT_SECONDS):
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+        return {"status": "database unavailable", "pool": get_pool_metrics()}
+    return {"status": "ready", "pool": get_pool_metrics()}
@@ -0,0 +1,56 @@
+from fastapi import APIRouter, status
+from fastapi.responses import PlainTextResponse
+from database import get_pool_metrics
+from utilities.password_hasher import password_hasher
+from utilities.cache import read_through_cache
+from utilities.pubsub import pubsub
+from utilities.metrics import registry
+
+router = APIRouter(prefix="/metrics", tags=["Metrics"])
+
+registry.add_collector("password_hasher", password_hasher.metrics)
+registry.add_collector("db_pool", get_pool_metrics)
+registry.add_collector("pubsub", pubsub.metrics)
+registry.add_collector("cache", lambda: {
+    f"{namespace}_{name}": value
+    for namespace, counters in read_through_cache.metrics().items()
+    for name, value in counters.items()
+})
+
+@router.get("", status_code=status.HTTP_200_OK, response_class=PlainTextResponse)
+async def get_metrics() -> PlainTextResponse:
+    """ Get the metrics of this worker in the Prometheus text format (request latency per route, status codes,
+        in flight requests, database queries per request, bcrypt time, pool and cache)
+
+    Returns:
+        PlainTextResponse: Metrics in the Prometheus text format
+    """
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+@router.get("/password-hasher", status_code=status.HTTP_200_OK)
+async def get_password_hasher_metrics() -> dict:
+    """ Get the password hashing pool metrics (queue depth, in flight, hash latency)
+
+    Returns:
+        dict: Metrics of the password hashing pool
+    """
+    return password_hasher.metrics()
+
+@router.get("/db-pool", status_code=status.HTTP_200_OK)
+async def get_db_pool_metrics() -> dict:
+    """ Get the database connection pool metrics (in use, overflow, checkout wait time)
+
+    Returns:
+        dict: Metrics of the connection pool
+    """
+    return get_pool_metrics()
+
+
+@router.get("/cache", status_code=status.HTTP_200_OK)
+async def get_cache_metrics() -> dict:
+    """ Get the read-through cache hits and misses per namespace
+
+    Returns:
+        dict: Metrics of the cache
+    """
+    return {"backend": type(read_through_cache.backend).__name__, "enabled": read_through_cache.enabled, "namespaces": read_through_cache.metrics()}
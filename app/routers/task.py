@@ -1,67 +1,319 @@
 from uuid import UUID
-from fastapi import APIRouter, Depends, status
-from sqlalchemy.orm import Session
-from services.auth import token_interceptor
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, Response, WebSocket, WebSocketException, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from services.auth import Principal, get_connection_principal, token_interceptor
 from utilities.utils import http_exception
-from services import task as task_service, user as user_service
-from database import get_db_context
-from models.task import TaskCreateOrUpdateModel, TaskViewModel
-from schemas.user import User
+from utilities.responses import EXPORT_MEDIA_TYPES, export_response, json_response
+from utilities.push import EVENT_STREAM_MEDIA_TYPE, event_stream_response, push_to_websocket
+from utilities.conditional import etag_headers, get_etag, is_not_modified, not_modified_response
+from services import task as task_service
+from database import get_async_db_context
+from models.task import BulkItemResultModel, TaskBulkUpdateModel, TaskChangesViewModel, TaskCreateOrUpdateModel, TaskSearchViewModel, TaskStatsViewModel, TaskViewModel
+from models.pagination import PageViewModel, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from schemas.base_entity import Priority, TaskStatus
+from settings import PUSH_ENABLED
 
 
 router = APIRouter(prefix="/tasks", tags=["Task"])
 
-@router.get("", status_code=status.HTTP_200_OK)
+MAX_BULK_SIZE = 1000
+MAX_SEARCH_LENGTH = 200
+
+@router.get("", status_code=status.HTTP_200_OK, response_model=PageViewModel[TaskViewModel], responses={status.HTTP_304_NOT_MODIFIED: {"description": "Not modified"}})
 async def get_all_tasks(
-    db: Session = Depends(get_db_context),
-    user: User = Depends(token_interceptor)
-    ) -> list[TaskViewModel]:
-    """ Get all tasks. If the user is admin, then get all tasks in a company else get all tasks belong to the user
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    task_status: TaskStatus | None = Query(None, alias="status"),
+    priority: Priority | None = None,
+    user_id: UUID | None = None,
+    db: AsyncSession = Depends(get_async_db_context),
+    user: Principal = Depends(token_interceptor)
+    ) -> Response:
+    """ Get a page of tasks. If the user is admin, then get all tasks in a company else get all tasks belong to the user.
+        The response has an ETag: a request with If-None-Match gets 304 Not modified, without querying the tasks, until a task of the company changes.
+
+    Args:
+        request (Request): The request
+        limit (int, optional): Page size. Defaults to DEFAULT_PAGE_SIZE.
+        cursor (str | None, optional): next_cursor of the previous page. Defaults to None.
+        task_status (TaskStatus | None, optional): Status to filter. Defaults to None.
+        priority (Priority | None, optional): Priority to filter. Defaults to None.
+        user_id (UUID | None, optional): User id to filter (admin only). Defaults to None.
+        db (AsyncSession, optional): Db context. Defaults to Depends(get_async_db_context).
+        user (Principal, optional): User from token. Defaults to Depends(token_interceptor).
+
+    Returns:
+        Response: A page of the tasks (PageViewModel[TaskViewModel]), or 304 Not modified
+    """
+    if not user.is_admin and user_id is not None and user_id != user.id:
+        raise http_exception(403, "You don't have permission to do this action")
+    etag = await get_etag(request, f"tasks:{user.company_id}", user.id, user.is_admin)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+    if user.is_admin:
+        page = await task_service.get_tasks_by_company_id(user.company_id, db, limit, cursor, task_status, priority, user_id)
+    else:
+        page = await task_service.get_tasks_by_user_id(user.id, db, limit, cursor, task_status, priority)
+    return json_response(PageViewModel[TaskViewModel], page, headers=etag_headers(etag))
+
+@router.get("/search", status_code=status.HTTP_200_OK, response_model=list[TaskSearchViewModel])
+async def search_tasks(
+    q: str = Query(min_length=1, max_length=MAX_SEARCH_LENGTH),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    task_status: TaskStatus | None = Query(None, alias="status"),
+    priority: Priority | None = None,
+    user_id: UUID | None = None,
+    db: AsyncSession = Depends(get_async_db_context),
+    user: Principal = Depends(token_interceptor)
+    ) -> Response:
+    """ Search the tasks by summary and description, best matches first. Every word must match, as a prefix.
+        If the user is admin, then search all tasks in a company else search the tasks belong to the user
+
+    Args:
+        q (str): Search text
+        limit (int, optional): Maximum number of tasks. Defaults to DEFAULT_PAGE_SIZE.
+        task_status (TaskStatus | None, optional): Status to filter. Defaults to None.
+        priority (Priority | None, optional): Priority to filter. Defaults to None.
+        user_id (UUID | None, optional): User id to filter (admin only). Defaults to None.
+        db (AsyncSession, optional): Db context. Defaults to Depends(get_async_db_context).
+        user (Principal, optional): User from token. Defaults to Depends(token_interceptor).
+
+    Raises:
+        http_exception: 403 Forbidden in case a non admin user filters on another user
+
+    Returns:
+        Response: The matching tasks with their rank (list[TaskSearchViewModel])
+    """
+    if user.is_admin:
+        tasks = await task_service.search_tasks(q, db, user.company_id, user_id, limit, task_status, priority)
+    elif user_id is not None and user_id != user.id:
+        raise http_exception(403, "You don't have permission to do this action")
+    else:
+        tasks = await task_service.search_tasks(q, db, None, user.id, limit, task_status, priority)
+    return json_response(list[TaskSearchViewModel], tasks)
+
+@router.get("/stats", status_code=status.HTTP_200_OK)
+async def get_task_stats(
+    user_id: UUID | None = None,
+    db: AsyncSession = Depends(get_async_db_context),
+    user: Principal = Depends(token_interceptor)
+    ) -> TaskStatsViewModel:
+    """ Count the tasks by status and by priority. If the user is admin, then count all tasks in a company else count the tasks belong to the user
 
     Args:
-        db (Session, optional): Db context. Defaults to Depends(get_db_context).
-        user (User, optional): User from token. Defaults to Depends(token_interceptor).
+        user_id (UUID | None, optional): User id to filter (admin only). Defaults to None.
+        db (AsyncSession, optional): Db context. Defaults to Depends(get_async_db_context).
+        user (Principal, optional): User from token. Defaults to Depends(token_interceptor).
+
+    Raises:
+        http_exception: 403 Forbidden in case a non admin user filters on another user
+
+    Returns:
+        TaskStatsViewModel: Total and counts by status and by priority
+    """
+    if user.is_admin:
+        return await task_service.get_task_stats(db, user.company_id, user_id)
+    if user_id is not None and user_id != user.id:
+        raise http_exception(403, "You don't have permission to do this action")
+    return await task_service.get_task_stats(db, None, user.id)
+
+@router.get("/changes", status_code=status.HTTP_200_OK)
+async def get_task_changes(
+    since: str | None = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_db_context),
+    user: Principal = Depends(token_interceptor)
+    ) -> TaskChangesViewModel:
+    """ Get the tasks inserted, updated or deleted since a cursor, to sync a copy of the tasks incrementally.
+        If the user is admin, then the changes of all tasks in a company else of the tasks belong to the user.
+        Call it without since to get the current cursor, then with the next_cursor of the previous call until has_more is false.
+
+    Args:
+        since (str | None, optional): next_cursor of the previous call. Defaults to None.
+        limit (int, optional): Maximum number of changes read. Defaults to DEFAULT_PAGE_SIZE.
+        db (AsyncSession, optional): Db context. Defaults to Depends(get_async_db_context).
+        user (Principal, optional): User from token. Defaults to Depends(token_interceptor).
 
     Returns:
-        list[TaskViewModel]: List of the tasks
+        TaskChangesViewModel: The changed tasks and the cursor of the next call
     """
     if user.is_admin:
-        users_in_company = user_service.get_users_by_company_id(user.company_id, db)
-        user_ids = [user.id for user in users_in_company]
-        return task_service.get_tasks_by_user_ids(user_ids, db)
-    return task_service.get_tasks_by_user_id(user.id, db)
+        return await task_service.get_task_changes(db, user.company_id, None, since, limit)
+    return await task_service.get_task_changes(db, None, user.id, since, limit)
+
+@router.get(
+    "/events",
+    status_code=status.HTTP_200_OK,
+    response_class=StreamingResponse,
+    responses={status.HTTP_200_OK: {"content": {EVENT_STREAM_MEDIA_TYPE: {}}}})
+async def stream_task_events(user: Principal = Depends(get_connection_principal)) -> StreamingResponse:
+    """ Push the task changes as Server-Sent Events (event tasks, data: list of TaskChangeViewModel, one event per write).
+        If the user is admin, then the changes of all tasks in a company else of the tasks belong to the user.
+        The token can be sent in the access_token query parameter (EventSource can not set headers).
+        The stream ends with an overflow event when the client is too slow, a shutdown event when the worker shuts down,
+        and an expired event when the token expires: reconnect, then catch up with GET /tasks/changes.
+
+    Args:
+        user (Principal, optional): User from token. Defaults to Depends(get_connection_principal).
+
+    Raises:
+        http_exception: 503 Service unavailable in case the push is disabled (poll GET /tasks/changes instead)
+
+    Returns:
+        StreamingResponse: The event stream
+    """
+    if not PUSH_ENABLED:
+        raise http_exception(503, "The push is disabled, poll GET /tasks/changes")
+    return event_stream_response(task_service.subscribe_task_changes(user.company_id, user.id, user.is_admin), user.exp)
 
-@router.get("/{id}", status_code=status.HTTP_200_OK)
+@router.websocket("/ws")
+async def task_events_websocket(websocket: WebSocket):
+    """ Push the task changes over a WebSocket (one text message per write: list of TaskChangeViewModel).
+        Same scope, token and end of stream as GET /tasks/events; the closing code is 1013 when the client is too slow,
+        1001 when the worker shuts down, 1008 when the token is invalid or expires or when the push is disabled.
+
+    Args:
+        websocket (WebSocket): The websocket
+    """
+    if not PUSH_ENABLED:
+        raise WebSocketException(status.WS_1008_POLICY_VIOLATION, "The push is disabled")
+    try:
+        user = get_connection_principal(websocket)
+    except HTTPException:
+        raise WebSocketException(status.WS_1008_POLICY_VIOLATION, "Invalid token")
+    await websocket.accept()
+    await push_to_websocket(websocket, task_service.subscribe_task_changes(user.company_id, user.id, user.is_admin), user.exp)
+
+@router.get(
+    "/export",
+    status_code=status.HTTP_200_OK,
+    response_class=StreamingResponse,
+    responses={status.HTTP_200_OK: {"content": {media_type: {} for media_type in EXPORT_MEDIA_TYPES.values()}}})
+async def export_tasks(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    task_status: TaskStatus | None = Query(None, alias="status"),
+    priority: Priority | None = None,
+    user_id: UUID | None = None,
+    user: Principal = Depends(token_interceptor)
+    ) -> StreamingResponse:
+    """ Export the tasks as NDJSON or CSV. If the user is admin, then export all tasks in a company else export the tasks belong to the user.
+        The tasks are streamed from a server side cursor, so the memory stays flat whatever the number of tasks.
+
+    Args:
+        format (str, optional): ndjson or csv. Defaults to ndjson.
+        task_status (TaskStatus | None, optional): Status to filter. Defaults to None.
+        priority (Priority | None, optional): Priority to filter. Defaults to None.
+        user_id (UUID | None, optional): User id to filter (admin only). Defaults to None.
+        user (Principal, optional): User from token. Defaults to Depends(token_interceptor).
+
+    Raises:
+        http_exception: 403 Forbidden in case a non admin user filters on another user
+
+    Returns:
+        StreamingResponse: The tasks ordered by created_at
+    """
+    if user.is_admin:
+        batches = task_service.export_tasks(user.company_id, user_id, task_status, priority)
+    elif user_id is not None and user_id != user.id:
+        raise http_exception(403, "You don't have permission to do this action")
+    else:
+        batches = task_service.export_tasks(None, user.id, task_status, priority)
+    return export_response(TaskViewModel, batches, format, "tasks")
+
+@router.post("/bulk", status_code=status.HTTP_201_CREATED)
+async def create_tasks(
+    models: list[TaskCreateOrUpdateModel] = Body(min_length=1, max_length=MAX_BULK_SIZE),
+    user: Principal = Depends(token_interceptor),
+    db: AsyncSession = Depends(get_async_db_context)) -> list[BulkItemResultModel]:
+    """ Create many tasks in one transaction
+
+    Args:
+        models (list[TaskCreateOrUpdateModel]): Tasks to create (up to MAX_BULK_SIZE)
+        user (Principal, optional): User from token. Defaults to Depends(token_interceptor).
+        db (AsyncSession, optional): Db context. Defaults to Depends(get_async_db_context).
+
+    Returns:
+        list[BulkItemResultModel]: Result for each task, in the order of the request
+    """
+    return await task_service.create_tasks(user.id, models, db)
+
+@router.put("/bulk", status_code=status.HTTP_200_OK)
+async def update_tasks(
+    models: list[TaskBulkUpdateModel] = Body(min_length=1, max_length=MAX_BULK_SIZE),
+    user: Principal = Depends(token_interceptor),
+    db: AsyncSession = Depends(get_async_db_context)) -> list[BulkItemResultModel]:
+    """ Update many tasks in one transaction
+        - If the user is admin, then any task can be updated
+        - If non user admin, then only the tasks of the user can be updated (403 for the others)
+
+    Args:
+        models (list[TaskBulkUpdateModel]): Tasks to update (up to MAX_BULK_SIZE)
+        user (Principal, optional): User from token. Defaults to Depends(token_interceptor).
+        db (AsyncSession, optional): Db context. Defaults to Depends(get_async_db_context).
+
+    Returns:
+        list[BulkItemResultModel]: Result for each task, in the order of the request
+    """
+    return await task_service.update_tasks(user.id, user.is_admin, models, db)
+
+@router.post("/bulk/delete", status_code=status.HTTP_200_OK)
+async def delete_tasks(
+    ids: list[UUID] = Body(min_length=1, max_length=MAX_BULK_SIZE),
+    user: Principal = Depends(token_interceptor),
+    db: AsyncSession = Depends(get_async_db_context)) -> list[BulkItemResultModel]:
+    """ Delete many tasks in one transaction
+        - If the user is admin, then any task can be deleted
+        - If non user admin, then only the tasks of the user can be deleted (403 for the others)
+
+    Args:
+        ids (list[UUID]): Ids of the tasks to delete (up to MAX_BULK_SIZE)
+        user (Principal, optional): User from token. Defaults to Depends(token_interceptor).
+        db (AsyncSession, optional): Db context. Defaults to Depends(get_async_db_context).
+
+    Returns:
+        list[BulkItemResultModel]: Result for each id, in the order of the request
+    """
+    return await task_service.delete_tasks(ids, user.id, user.is_admin, db)
+
+@router.get("/{id}", status_code=status.HTTP_200_OK, response_model=TaskViewModel)
 async def get_task_by_id(
     id: UUID,
-    db: Session = Depends(get_db_context),
-    user: User = Depends(token_interceptor)
-    ) -> TaskViewModel:
+    db: AsyncSession = Depends(get_async_db_context),
+    user: Principal = Depends(token_interceptor)
+    ) -> Response:
     """ Get a task by Id
         - If the user is admin, then get the task by the task id
         - If non user admin, then get the task by user_id and task id
 
     Args:
         id (UUID): Task Id
-        db (Session, optional): Db context. Defaults to Depends(get_db_context).
-        user (User, optional): User. Defaults to Depends(token_interceptor).
+        db (AsyncSession, optional): Db context. Defaults to Depends(get_async_db_context).
+        user (Principal, optional): User. Defaults to Depends(token_interceptor).
+
+    Raises:
+        http_exception: 404 Not found in case the task could not be found
 
     Returns:
-        TaskViewModel: A Task view model
+        Response: A Task view model
     """
-    return task_service.get_task_by_id(id, user.id, user.is_admin, db)
+    task = await task_service.get_task_by_id(id, user.id, user.is_admin, db)
+    if task is None:
+        raise http_exception(404, "The task could not be found")
+    return json_response(TaskViewModel, task)
 
 @router.post("", status_code=status.HTTP_201_CREATED)
 async def create_a_task(
     model: TaskCreateOrUpdateModel,
-    user: User = Depends(token_interceptor),
-    db: Session = Depends(get_db_context)) -> bool:
+    user: Principal = Depends(token_interceptor),
+    db: AsyncSession = Depends(get_async_db_context)) -> bool:
     """ Create a task
 
     Args:
         model (TaskCreateOrUpdateModel): Task model to create
-        user (User, optional): User from token. Defaults to Depends(token_interceptor).
-        db (Session, optional): Db context. Defaults to Depends(get_db_context).
+        user (Principal, optional): User from token. Defaults to Depends(token_interceptor).
+        db (AsyncSession, optional): Db context. Defaults to Depends(get_async_db_context).
 
     Raises:
         http_exception: 404 Not found in case the user id could not be found
@@ -69,7 +321,7 @@ async def create_a_task(
     Returns:
         bool: True if task created successfully
     """
-    result = task_service.create_or_update_a_task(user.id, user.is_admin, model, db)
+    result = await task_service.create_or_update_a_task(user.id, user.is_admin, model, db)
     match result:
         case status.HTTP_201_CREATED:
             return True
@@ -80,15 +332,15 @@ async def create_a_task(
 async def update_a_task(
     id: UUID,
     model: TaskCreateOrUpdateModel,
-    user: User = Depends(token_interceptor),
-    db: Session = Depends(get_db_context)) -> bool:
+    user: Principal = Depends(token_interceptor),
+    db: AsyncSession = Depends(get_async_db_context)) -> bool:
     """ Update a task
 
     Args:
         id (UUID): Id of the task
         model (TaskCreateOrUpdateModel): Task model to update
-        user (User, optional): User from token. Defaults to Depends(token_interceptor).
-        db (Session, optional): Db context. Defaults to Depends(get_db_context).
+        user (Principal, optional): User from token. Defaults to Depends(token_interceptor).
+        db (AsyncSession, optional): Db context. Defaults to Depends(get_async_db_context).
 
     Raises:
         http_exception: 404 Not found in case the user id could not be found
@@ -97,7 +349,7 @@ async def update_a_task(
     Returns:
         bool: _description_
     """
-    result = task_service.create_or_update_a_task(user.id, user.is_admin, model, db, id)
+    result = await task_service.create_or_update_a_task(user.id, user.is_admin, model, db, id)
     match result:
         case status.HTTP_200_OK:
             return True
@@ -109,14 +361,14 @@ async def update_a_task(
 @router.delete("/{id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_a_task(
     id: UUID, 
-    user: User = Depends(token_interceptor), 
-    db: Session = Depends(get_db_context)) -> None:
+    user: Principal = Depends(token_interceptor), 
+    db: AsyncSession = Depends(get_async_db_context)) -> None:
     """ Delete a task
 
     Args:
         id (UUID): Task Id to delete
-        user (User, optional): User from token. Defaults to Depends(token_interceptor).
-        db (Session, optional): Db context. Defaults to Depends(get_db_context).
+        user (Principal, optional): User from token. Defaults to Depends(token_interceptor).
+        db (AsyncSession, optional): Db context. Defaults to Depends(get_async_db_context).
 
     Raises:
         http_exception: 404 Not found in case the task could not be found to delete
@@ -125,7 +377,7 @@ async def delete_a_task(
     Returns:
         _type_: 204 No content
     """
-    result = task_service.delete_a_task(id, user.id, user.is_admin, db)
+    result = await task_service.delete_a_task(id, user.id, user.is_admin, db)
     match result:
         case status.HTTP_204_NO_CONTENT:
             return status.HTTP_204_NO_CONTENT
@@ -1,69 +1,83 @@
-from fastapi import APIRouter, Depends, status
-from services.auth import token_interceptor
+from fastapi import APIRouter, Depends, Query, Request, Response, status
+from services.auth import Principal, token_interceptor
 from models.user import UserViewModel, UserCreateOrUpdateModel
-from database import get_db_context
-from sqlalchemy.orm import Session
+from models.pagination import PageViewModel, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from database import get_async_db_context
+from sqlalchemy.ext.asyncio import AsyncSession
 from services import user as user_service
 from uuid import UUID
-from schemas.user import User
 from utilities.utils import http_exception
+from utilities.responses import json_response
+from utilities.conditional import etag_headers, get_etag, is_not_modified, not_modified_response
 
 router = APIRouter(prefix="/users", tags=["User"])
 
-@router.get("", status_code=status.HTTP_200_OK)
+@router.get("", status_code=status.HTTP_200_OK, response_model=PageViewModel[UserViewModel], responses={status.HTTP_304_NOT_MODIFIED: {"description": "Not modified"}})
 async def get_all_user(
-    user: User = Depends(token_interceptor),
-    db: Session = Depends(get_db_context)) -> list[UserViewModel]:
-    """ Get all users
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    user: Principal = Depends(token_interceptor),
+    db: AsyncSession = Depends(get_async_db_context)) -> Response:
+    """ Get a page of users
         - If the user is admin -> Get all users in the same company
         - If the usre is non admin -> Get the user from the token (logged user)
+        The response has an ETag: a request with If-None-Match gets 304 Not modified, without querying the users, until a user of the company changes.
     Args:
-        user (User, optional): User from token. Defaults to Depends(token_interceptor).
-        db (Session, optional): Db context. Defaults to Depends(get_db_context).
+        request (Request): The request
+        limit (int, optional): Page size. Defaults to DEFAULT_PAGE_SIZE.
+        cursor (str | None, optional): next_cursor of the previous page. Defaults to None.
+        user (Principal, optional): User from token. Defaults to Depends(token_interceptor).
+        db (AsyncSession, optional): Db context. Defaults to Depends(get_async_db_context).
 
     Returns:
-        list[UserViewModel]: A list of users
+        Response: A page of users (PageViewModel[UserViewModel]), or 304 Not modified
     """
+    etag = await get_etag(request, f"users:{user.company_id}", user.id, user.is_admin)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
     if not user.is_admin:
-        return [user_service.get_user_by_id(user.id, db)]
-    
-    return user_service.get_users_by_company_id(user.company_id, db)
+        logged_user = await user_service.get_user_by_id(user.id, db)
+        page = PageViewModel(items=[logged_user] if logged_user and cursor is None else [])
+    else:
+        page = await user_service.get_users_by_company_id(user.company_id, db, limit, cursor)
+    return json_response(PageViewModel[UserViewModel], page, headers=etag_headers(etag))
 
-@router.get("/{id}", status_code=status.HTTP_200_OK)
+@router.get("/{id}", status_code=status.HTTP_200_OK, response_model=UserViewModel)
 async def get_user_by_id(
     id: UUID,
-    user: User = Depends(token_interceptor),
-    db: Session = Depends(get_db_context)) -> UserViewModel:
+    user: Principal = Depends(token_interceptor),
+    db: AsyncSession = Depends(get_async_db_context)) -> Response:
     """ Get user by Id
         - TODO: Need to check if user id to get has the same company with the logged user
     Args:
         id (UUID): Id of the user
-        user (User, optional): User from token. Defaults to Depends(token_interceptor).
-        db (Session, optional): Db context. Defaults to Depends(get_db_context).
+        user (Principal, optional): User from token. Defaults to Depends(token_interceptor).
+        db (AsyncSession, optional): Db context. Defaults to Depends(get_async_db_context).
 
     Raises:
         http_exception: 403 Forbbiden in case the user does not have permission to do this action (not admin)
         http_exception: 404 Not found in case the user could not be found
 
     Returns:
-        UserViewModel: A user model
+        Response: A user model
     """
     # Not user admin
     if not user.is_admin and user.id != id:
         raise http_exception(403, "You don't have permission to do this action")
-    result = user_service.get_user_by_id(id, db)
+    result = await user_service.get_user_by_id(id, db)
     if not result:
         raise http_exception(404, "The user could not be found")
-    return result
+    return json_response(UserViewModel, result)
     
 
 @router.post("", status_code=status.HTTP_201_CREATED)
-async def create_a_new_user(model: UserCreateOrUpdateModel, db: Session = Depends(get_db_context))->bool:
+async def create_a_new_user(model: UserCreateOrUpdateModel, db: AsyncSession = Depends(get_async_db_context))->bool:
     """ Create a new user
 
     Args:
         model (UserCreateOrUpdateModel): user to create
-        db (Session, optional): Db context. Defaults to Depends(get_db_context).
+        db (AsyncSession, optional): Db context. Defaults to Depends(get_async_db_context).
 
     Raises:
         http_exception: 404 Not found in case the company could not be found
@@ -73,7 +87,7 @@ async def create_a_new_user(model: UserCreateOrUpdateModel, db: Session = Depend
     Returns:
         bool: True if sucess
     """
-    result = user_service.create_or_update_user(db, model)
+    result = await user_service.create_or_update_user(db, model)
     match result:
         case status.HTTP_201_CREATED:
             return True
@@ -89,15 +103,15 @@ async def create_a_new_user(model: UserCreateOrUpdateModel, db: Session = Depend
 async def update_a_user(
     id: UUID,
     model: UserCreateOrUpdateModel,
-    user: User = Depends(token_interceptor),
-    db: Session = Depends(get_db_context)) -> bool:
+    user: Principal = Depends(token_interceptor),
+    db: AsyncSession = Depends(get_async_db_context)) -> bool:
     """ Update a user
         - TODO: Need to check if user id to update has the same company with the logged user
     Args:
         id (UUID): Id of the user
         model (UserCreateOrUpdateModel): user model to update
-        user (User, optional): User from token. Defaults to Depends(token_interceptor).
-        db (Session, optional): Db context. Defaults to Depends(get_db_context).
+        user (Principal, optional): User from token. Defaults to Depends(token_interceptor).
+        db (AsyncSession, optional): Db context. Defaults to Depends(get_async_db_context).
 
     Raises:
         http_exception: 403 Forbiden in case user is non admin and try to update for other user
@@ -110,7 +124,7 @@ async def update_a_user(
     """
     if not user.is_admin and user.id != id:
         raise http_exception(403, "You have permission to do this action")
-    result = user_service.create_or_update_user(db, model, id)
+    result = await user_service.create_or_update_user(db, model, id)
     match result:
         case status.HTTP_200_OK:
             return True
@@ -125,15 +139,15 @@ async def update_a_user(
 @router.delete("/{id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_a_user(
     id: UUID,
-    user: User = Depends(token_interceptor),
-    db: Session = Depends(get_db_context)) -> None:
+    user: Principal = Depends(token_interceptor),
+    db: AsyncSession = Depends(get_async_db_context)) -> None:
     """ Soft delete a user
        - TODO: Need to check if user id detele get has the same company with the logged user
 
     Args:
         id (UUID): User id
-        user (User, optional): User from token. Defaults to Depends(token_interceptor).
-        db (Session, optional): Db context. Defaults to Depends(get_db_context).
+        user (Principal, optional): User from token. Defaults to Depends(token_interceptor).
+        db (AsyncSession, optional): Db context. Defaults to Depends(get_async_db_context).
 
     Raises:
         http_exception: 403 Forbiden in case the user does not have permission to do this action (non admin)
@@ -145,7 +159,7 @@ async def delete_a_user(
     """
     if not user.is_admin and user.id != id:
         raise http_exception(403, "You don't have permission to do this action")
-    result = user_service.delete_a_user(id, db)
+    result = await user_service.delete_a_user(id, db)
     match result:
         case status.HTTP_404_NOT_FOUND:
             raise http_exception(404, "The user id does not exist to delete")
@@ -1,6 +1,6 @@
 import enum
 import uuid
-from sqlalchemy import Column, Uuid, Time
+from sqlalchemy import Column, Uuid, DateTime
 from datetime import datetime
 
 class CompanyMode(enum.Enum):
@@ -18,7 +18,12 @@ class Priority(enum.Enum):
     MEDIUM = 'MED'
     LOW = 'LOW'
 
+class ChangeOperation(enum.Enum):
+    INSERT = 'INS'
+    UPDATE = 'UPD'
+    DELETE = 'DEL'
+
 class BaseEntity:
     id = Column(Uuid, primary_key=True, default=uuid.uuid4)
-    created_at = Column(Time, nullable=False, default=datetime.now())
-    updated_at = Column(Time, nullable=True)
\ No newline at end of file
+    created_at = Column(DateTime, nullable=False, default=datetime.now)
+    updated_at = Column(DateTime, nullable=True)
\ No newline at end of file
@@ -1,11 +1,14 @@
 from database import Base
 from .base_entity import BaseEntity
-from sqlalchemy import Column, String, Float
+from sqlalchemy import Column, String, Float, Index
 from sqlalchemy.orm import relationship
 from schemas.user import User
 
 class Company(Base, BaseEntity):
     __tablename__ = "companies"
+    __table_args__ = (
+        Index("ix_companies_created_at_id", "created_at", "id"),
+    )
 
     name = Column(String, nullable=False)
     description = Column(String, nullable=True)
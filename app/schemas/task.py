@@ -1,14 +1,41 @@
 from database import Base
 from schemas.base_entity import BaseEntity, Priority, TaskStatus
-from sqlalchemy import Column, String, Enum, Uuid, ForeignKey
+from sqlalchemy import DDL, Column, String, Enum, Uuid, ForeignKey, Index, event
 from sqlalchemy.orm import relationship
 
 class Task(Base, BaseEntity):
     __tablename__ = "tasks"
+    __table_args__ = (
+        Index("ix_tasks_user_id_created_at", "user_id", "created_at", "id"),
+        Index("ix_tasks_created_at_id", "created_at", "id"),
+    )
       
     summary = Column(String, nullable=False)
     description = Column(String, nullable=True)  
     status = Column(Enum(TaskStatus), nullable=False, default=TaskStatus.NEW)
     priority = Column(Enum(Priority), nullable=False, default=Priority.MEDIUM)        
     user_id = Column(Uuid, ForeignKey("users.id"), nullable=False)
-    user = relationship("User")
\ No newline at end of file
+    user = relationship("User")
+
+
+# Full text search on summary and description (services.task.search_tasks). The migrations add the Postgres column and index,
+# these statements give the same search to the databases created by create_all (benchmarks, local SQLite)
+SEARCH_VECTOR = "setweight(to_tsvector('simple', coalesce(summary, '')), 'A') || setweight(to_tsvector('simple', coalesce(description, '')), 'B')"
+for statement in (
+    f"ALTER TABLE tasks ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ({SEARCH_VECTOR}) STORED",
+    "CREATE INDEX ix_tasks_search_vector ON tasks USING gin (search_vector)",
+):
+    event.listen(Task.__table__, "after_create", DDL(statement).execute_if(dialect="postgresql"))
+# SQLite: FTS5 index over the tasks, kept in sync by triggers. The rowid of tasks (UUID primary key) can change on VACUUM,
+# so the index keeps its own copy of the text with the task id, which the search joins on
+for statement in (
+    "CREATE VIRTUAL TABLE tasks_fts USING fts5(task_id UNINDEXED, summary, description)",
+    "CREATE TRIGGER tasks_fts_insert AFTER INSERT ON tasks BEGIN "
+    "INSERT INTO tasks_fts (task_id, summary, description) VALUES (new.id, new.summary, new.description); END",
+    "CREATE TRIGGER tasks_fts_delete AFTER DELETE ON tasks BEGIN "
+    "DELETE FROM tasks_fts WHERE task_id = old.id; END",
+    "CREATE TRIGGER tasks_fts_update AFTER UPDATE OF summary, description ON tasks BEGIN "
+    "UPDATE tasks_fts SET summary = new.summary, description = new.description WHERE task_id = old.id; END",
+):
+    event.listen(Task.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+event.listen(Task.__table__, "after_drop", DDL("DROP TABLE IF EXISTS tasks_fts").execute_if(dialect="sqlite"))
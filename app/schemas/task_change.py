@@ -0,0 +1,24 @@
+from datetime import datetime
+from database import Base
+from schemas.base_entity import ChangeOperation
+from sqlalchemy import BigInteger, Column, DateTime, Enum, Index, Integer, Uuid
+
+class TaskChange(Base):
+    """ Append-only log of the task writes, written in the transaction of the write (see services.task.get_task_changes).
+        The company and the owner are copied so the log can be read per scope after the task is deleted.
+    """
+    __tablename__ = "task_changes"
+    __table_args__ = (
+        Index("ix_task_changes_company_id_txid_seq", "company_id", "txid", "seq"),
+        Index("ix_task_changes_user_id_txid_seq", "user_id", "txid", "seq"),
+    )
+
+    # SQLite only auto increments an INTEGER primary key
+    seq = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    # Id of the writing transaction on Postgres (txid_current), 0 on SQLite
+    txid = Column(BigInteger, nullable=False, default=0)
+    task_id = Column(Uuid, nullable=False)
+    user_id = Column(Uuid, nullable=False)
+    company_id = Column(Uuid, nullable=False)
+    op = Column(Enum(ChangeOperation), nullable=False)
+    changed_at = Column(DateTime, nullable=False, default=datetime.now)
@@ -0,0 +1,14 @@
+from database import Base
+from schemas.base_entity import Priority, TaskStatus
+from sqlalchemy import Column, Enum, Integer, Uuid, ForeignKey
+
+class TaskStat(Base):
+    """ Number of tasks by user, status and priority.
+        Maintained by statement level triggers on tasks in the same transaction as the writes (see the add task stats migration, Postgres only)
+    """
+    __tablename__ = "task_stats"
+
+    user_id = Column(Uuid, ForeignKey("users.id"), primary_key=True)
+    status = Column(Enum(TaskStatus), primary_key=True)
+    priority = Column(Enum(Priority), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
@@ -1,17 +1,27 @@
 from database import Base
 from schemas.base_entity import BaseEntity
-from sqlalchemy import Column, String, Boolean, Uuid, ForeignKey
+from sqlalchemy import Column, String, Boolean, Uuid, ForeignKey, Index
 from sqlalchemy.orm import relationship
-from passlib.context import CryptContext
+from functools import cache
 from schemas.task import Task
+from utilities.password_hasher import password_hasher
 
-bcrypt_context = CryptContext(schemes=["bcrypt"])
+@cache
+def get_bcrypt_context():
+    """ The passlib context, imported on first use so the app imports faster """
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"])
 
 class User(Base, BaseEntity):
     __tablename__ = "users"
+    __table_args__ = (
+        Index("ix_users_company_id_is_active", "company_id", "is_active", "created_at", "id"),
+        Index("uq_users_email", "email", unique=True),
+        Index("uq_users_user_name", "user_name", unique=True),
+    )
 
-    email = Column(String, nullable=False, unique=True)
-    user_name = Column(String, nullable=False, unique=True)
+    email = Column(String, nullable=False)
+    user_name = Column(String, nullable=False)
     first_name = Column(String, nullable=True)    
     last_name = Column(String, nullable=True)
     hashed_password = Column(String, nullable=True)        
@@ -22,7 +32,17 @@ class User(Base, BaseEntity):
     taks = relationship("Task", back_populates="user", lazy=True)
     
 def get_hashed_password(password):
-    return bcrypt_context.hash(password)
+    return get_bcrypt_context().hash(password)
 
 def verify_password(plain_text_pass, hashed_password):
-    return bcrypt_context.verify(plain_text_pass, hashed_password)
\ No newline at end of file
+    return get_bcrypt_context().verify(plain_text_pass, hashed_password)
+
+async def get_hashed_password_async(password):
+    return await password_hasher.run(get_hashed_password, password)
+
+async def verify_password_async(plain_text_pass, hashed_password):
+    return await password_hasher.run(verify_password, plain_text_pass, hashed_password)
+
+def load_password_hashing():
+    """ Load the bcrypt backend, which passlib otherwise loads (and self tests) on the first hash """
+    get_bcrypt_context().handler().get_backend()
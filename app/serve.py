@@ -0,0 +1,139 @@
+""" Production entry point: runs the app on several uvicorn workers with uvloop and httptools.
+    Each worker warms up (connection pool, bcrypt backend) in the lifespan startup, before it accepts traffic.
+    On SIGTERM it reports itself as not ready for SHUTDOWN_PRE_STOP_SECONDS before it stops accepting connections.
+
+    > cd app
+    > python serve.py
+"""
+import asyncio
+import logging
+import os
+import signal
+import sys
+from importlib.util import find_spec
+import uvicorn
+from uvicorn.main import STARTUP_FAILURE
+from uvicorn.supervisors import Multiprocess
+from settings import (
+    SERVER_HOST, SERVER_PORT, SERVER_WORKERS, SERVER_BACKLOG, SERVER_KEEP_ALIVE_SECONDS,
+    SERVER_LIMIT_CONCURRENCY, SERVER_ACCESS_LOG, SHUTDOWN_PRE_STOP_SECONDS, SHUTDOWN_DRAIN_SECONDS,
+    CACHE_BACKEND, CACHE_ENABLED, PUBSUB_BACKEND, PUSH_ENABLED, RATE_LIMIT_ENABLED, RATE_LIMIT_BACKEND
+)
+
+
+class Server(uvicorn.Server):
+    """ On SIGTERM uvicorn closes the socket, waits for the open connections and only then runs the lifespan shutdown.
+        This server first reports the worker as shutting down (GET /health/ready returns 503) and keeps serving
+        for SHUTDOWN_PRE_STOP_SECONDS, so that the load balancer stops routing to the worker before it stops accepting.
+        A second Ctrl+C skips the wait.
+    """
+
+    pre_stop: asyncio.TimerHandle | None = None
+
+    def handle_exit(self, sig, frame):
+        if self.should_exit or not self.started:
+            super().handle_exit(sig, frame)
+            return
+        if self.pre_stop is not None:
+            if sig == signal.SIGINT:
+                self.pre_stop.cancel()
+                self.stop()
+            return
+        # The app is imported by the worker, not by the supervisor process
+        from lifespan import begin_shutdown
+        begin_shutdown()
+        self.pre_stop = asyncio.get_event_loop().call_later(SHUTDOWN_PRE_STOP_SECONDS, self.stop)
+
+    def stop(self):
+        from lifespan import begin_shutdown
+        # Again, for the event streams opened during the pre stop
+        begin_shutdown()
+        self.should_exit = True
+
+
+class Supervisor(Multiprocess):
+    """ Signals all the workers at once, the uvicorn supervisor waits for each one before signaling the next
+        so the pre stop and the drain would add up over the workers
+    """
+
+    def shutdown(self):
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            process.join()
+        logging.getLogger("uvicorn.error").info(f"Stopping parent process [{self.pid}]")
+
+
+def get_workers() -> int:
+    """ Number of worker processes: SERVER_WORKERS, else one per CPU available to the process
+
+    Returns:
+        int: Number of workers
+    """
+    if SERVER_WORKERS > 0:
+        return SERVER_WORKERS
+    cpus = os.sched_getaffinity(0) if hasattr(os, "sched_getaffinity") else None
+    return len(cpus) if cpus else os.cpu_count() or 1
+
+def disable_per_worker_features(workers: int):
+    """ Disable the features whose memory backend would be wrong with several workers, the workers read the settings
+        from the environment:
+        - Cache and ETags: the writes of a worker do not invalidate the others, their reads and 304 would be stale
+        - Push: the writes of a worker are not pushed to the clients connected to the others, which never know they missed them
+
+    Args:
+        workers (int): Number of workers
+    """
+    logger = logging.getLogger("uvicorn.error")
+    if CACHE_ENABLED and CACHE_BACKEND != "redis":
+        logger.warning(
+            f"CACHE_BACKEND={CACHE_BACKEND} is per worker, the cache and the ETags are disabled with {workers} workers. "
+            "Set CACHE_BACKEND=redis to enable them"
+        )
+        os.environ["CACHE_ENABLED"] = "false"
+    if PUSH_ENABLED and PUBSUB_BACKEND != "redis":
+        logger.warning(
+            f"PUBSUB_BACKEND={PUBSUB_BACKEND} is per worker, the push (GET /tasks/events, /tasks/ws) is disabled with {workers} workers. "
+            "Set PUBSUB_BACKEND=redis to enable it"
+        )
+        os.environ["PUSH_ENABLED"] = "false"
+
+def main():
+    config = uvicorn.Config(
+        "main:app",
+        host=SERVER_HOST,
+        port=SERVER_PORT,
+        workers=get_workers(),
+        # uvloop is not available on Windows
+        loop="uvloop" if find_spec("uvloop") else "asyncio",
+        http="httptools",
+        backlog=SERVER_BACKLOG,
+        timeout_keep_alive=SERVER_KEEP_ALIVE_SECONDS,
+        limit_concurrency=SERVER_LIMIT_CONCURRENCY or None,
+        access_log=SERVER_ACCESS_LOG,
+        # After the pre stop, uvicorn stops accepting connections and waits for the open ones before the lifespan shutdown
+        timeout_graceful_shutdown=SHUTDOWN_DRAIN_SECONDS,
+        lifespan="on"
+    )
+    if config.workers > 1:
+        if RATE_LIMIT_ENABLED and RATE_LIMIT_BACKEND != "redis":
+            # Each worker would keep its own buckets, the limits would be multiplied by the number of workers.
+            # The limiter protects the login: it is not disabled behind the back of the operator
+            logging.getLogger("uvicorn.error").error(
+                f"RATE_LIMIT_BACKEND={RATE_LIMIT_BACKEND} is per worker, with {config.workers} workers the limits would be "
+                f"{config.workers} times the configured ones. Set RATE_LIMIT_BACKEND=redis, SERVER_WORKERS=1 or RATE_LIMIT_ENABLED=false"
+            )
+            sys.exit(STARTUP_FAILURE)
+        disable_per_worker_features(config.workers)
+    # Same as uvicorn.run, with the server above
+    server = Server(config)
+    if config.workers > 1:
+        Supervisor(config, target=server.run, sockets=[config.bind_socket()]).run()
+    else:
+        server.run()
+        if not server.started:
+            sys.exit(STARTUP_FAILURE)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,43 @@
+import hashlib
+import time
+from dataclasses import dataclass
 from datetime import timedelta
 from datetime import datetime
 from typing import Optional
 from fastapi import Depends, HTTPException, status
+from fastapi.requests import HTTPConnection
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from schemas.user import User, verify_password
-from jose import JWTError, jwt
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from schemas.user import User, verify_password_async
 from uuid import UUID
 
-from settings import JWT_SECRET, JWT_ALGORITHM
+from settings import JWT_SECRET, JWT_ALGORITHM, TOKEN_CACHE_SIZE, TOKEN_CACHE_TTL_SECONDS
+from utilities.cache import LRUCache
 
 oa2_bearer = OAuth2PasswordBearer(tokenUrl="/auth/token")
 
-def authenticate(username: str, password: str, db: Session):
-    user = db.query(User).filter(User.user_name == username).first()
+# Verified tokens, keyed by the sha256 digest of the token
+token_cache = LRUCache(TOKEN_CACHE_SIZE, TOKEN_CACHE_TTL_SECONDS)
+
+@dataclass(frozen=True, slots=True)
+class Principal:
+    """ The logged user, built from the token claims """
+    id: UUID
+    user_name: str
+    first_name: str | None
+    last_name: str | None
+    is_admin: bool
+    is_active: bool
+    company_id: UUID
+    exp: float
+
+async def authenticate(username: str, password: str, db: AsyncSession):
+    user = await db.scalar(select(User).where(User.user_name == username))
 
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    if not await verify_password_async(password, user.hashed_password):
         return False
     return user
 
@@ -29,6 +49,8 @@ def token_exception():
     )
 
 def create_access_token(user: User, expires: Optional[timedelta] = None):
+    # jose is imported on first use so the app imports faster
+    from jose import jwt
     claims = {
         "sub": user.user_name,
         "id": str(user.id),
@@ -42,20 +64,76 @@ def create_access_token(user: User, expires: Optional[timedelta] = None):
     claims.update({"exp": expire})
     return jwt.encode(claims, JWT_SECRET, algorithm=JWT_ALGORITHM), expire
 
-def token_interceptor(token: str = Depends(oa2_bearer)) -> User:
+def decode_token(token: str) -> Principal:
+    """ Verify a token and build the principal from its claims
+
+    Args:
+        token (str): Access token
+
+    Raises:
+        token_exception: 401 Unauthorized in case the token is invalid, expired or the user is not active
+
+    Returns:
+        Principal: The logged user
+    """
+    from jose import JWTError, jwt
     try:
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        user = User()
-        user.user_name = payload.get("sub")
-        user.id = UUID(payload.get("id"))
-        user.first_name = payload.get("first_name")
-        user.last_name = payload.get("last_name")
-        user.is_admin = payload.get("is_admin")
-        user.is_active = payload.get("is_active")
-        user.company_id = UUID(payload.get("company_id"))
-        
-        if user.user_name is None or user.id is None or not user.is_active:
-            raise token_exception()
-        return user
-    except JWTError:
-        raise token_exception()
\ No newline at end of file
+        principal = Principal(
+            id=UUID(payload.get("id")),
+            user_name=payload.get("sub"),
+            first_name=payload.get("first_name"),
+            last_name=payload.get("last_name"),
+            is_admin=payload.get("is_admin"),
+            is_active=payload.get("is_active"),
+            company_id=UUID(payload.get("company_id")),
+            exp=payload.get("exp")
+        )
+    except (JWTError, TypeError, ValueError):
+        raise token_exception()
+    if principal.user_name is None or not principal.is_active:
+        raise token_exception()
+    return principal
+
+def get_principal(token: str) -> Principal:
+    """ Get the principal of a token, verifying the token only if it is not cached yet.
+        An entry never outlives the exp claim of its token.
+
+    Args:
+        token (str): Access token
+
+    Returns:
+        Principal: The logged user
+    """
+    key = hashlib.sha256(token.encode()).digest()
+    principal = token_cache.get(key)
+    if principal is None:
+        principal = decode_token(token)
+        ttl = min(TOKEN_CACHE_TTL_SECONDS, principal.exp - time.time())
+        if ttl > 0:
+            token_cache.set(key, principal, ttl)
+    return principal
+
+async def token_interceptor(token: str = Depends(oa2_bearer)) -> Principal:
+    return get_principal(token)
+
+def get_connection_principal(connection: HTTPConnection) -> Principal:
+    """ Get the principal of a push connection (WebSocket, Server-Sent Events).
+        Same token as token_interceptor, sent in the Authorization header or in the access_token query parameter,
+        as browsers can not set headers on a WebSocket or an EventSource.
+
+    Args:
+        connection (HTTPConnection): The request or the websocket
+
+    Raises:
+        token_exception: 401 Unauthorized in case there is no token or it is invalid
+
+    Returns:
+        Principal: The logged user
+    """
+    scheme, _, token = connection.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        token = connection.query_params.get("access_token")
+    if not token:
+        raise token_exception()
+    return get_principal(token)
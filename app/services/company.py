@@ -1,41 +1,54 @@
 from datetime import datetime
 from models.company import CompapnyViewModel, CompanyCreateOrUpdateModel
-from sqlalchemy.orm import Session
+from models.pagination import PageViewModel, DEFAULT_PAGE_SIZE
+from utilities.pagination import paginate, build_page
+from utilities.cache import read_through_cache, scope_versions
+from utilities.rows import fetch_row, fetch_rows
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import status
 from schemas.company import Company
 from uuid import UUID
 import logging
 
-def get_all_company(db: Session) -> list[CompapnyViewModel]:
-    """ Get all companies
+COMPANY_VIEW_COLUMNS = (Company.id, Company.name, Company.description, Company.rating, Company.created_at)
+
+async def get_all_company(db: AsyncSession, limit: int = DEFAULT_PAGE_SIZE, cursor: str = None) -> PageViewModel[CompapnyViewModel]:
+    """ Get a page of companies
 
     Args:
-        db (Session): Db context
+        db (AsyncSession): Db context
+        limit (int, optional): Page size. Defaults to DEFAULT_PAGE_SIZE.
+        cursor (str, optional): Cursor of the previous page. Defaults to None.
 
     Returns:
-        list[CompapnyViewModel]: List of CompanyViewModel
+        PageViewModel[CompapnyViewModel]: A page of CompanyViewModel
     """
-    return db.query(Company).all()
+    async def load():
+        return build_page(await fetch_rows(db, paginate(select(*COMPANY_VIEW_COLUMNS), Company, limit, cursor)), limit)
+    return await read_through_cache.get_or_load("companies", f"{limit}:{cursor}", load, PageViewModel[CompapnyViewModel])
 
 
-def get_company_by_id(id: UUID, db: Session) -> CompapnyViewModel:
+async def get_company_by_id(id: UUID, db: AsyncSession) -> CompapnyViewModel:
     """ Get company by Id
 
     Args:
         id (UUID): Id of the company
-        db (Session): Db context
+        db (AsyncSession): Db context
 
     Returns:
         CompapnyViewModel: Object CompapnyViewModel
     """
-    return db.query(Company).filter(Company.id == id).first()
+    return await read_through_cache.get_or_load(
+        "company", id, lambda: fetch_row(db, select(*COMPANY_VIEW_COLUMNS).where(Company.id == id)), CompapnyViewModel
+    )
 
-def create_or_update_company(model: CompanyCreateOrUpdateModel,  db: Session, company_id: UUID = None) -> status:
+async def create_or_update_company(model: CompanyCreateOrUpdateModel,  db: AsyncSession, company_id: UUID = None) -> status:
     """ Create or update an company
 
     Args:
         model (CompanyCreateOrUpdateModel): createOrUpdateModel
-        db (Session): Db context
+        db (AsyncSession): Db context
         company_id (UUID, Optional): Company Id to update
     Returns:
         status: 201 Created/ 404 Not found/ 200 OK/ 500 Internal Server Error
@@ -45,46 +58,53 @@ def create_or_update_company(model: CompanyCreateOrUpdateModel,  db: Session, co
             new_company = Company(**model.model_dump())
             
             db.add(new_company)
-            db.commit()
+            await db.commit()
+            await read_through_cache.invalidate_namespace("companies")
             return status.HTTP_201_CREATED
         else: # Update
-            existing_company = db.query(Company).filter(Company.id==company_id).first()
+            updated_id = await db.scalar(
+                update(Company).where(Company.id==company_id).values(
+                    name=model.name,
+                    description=model.description,
+                    rating=model.rating,
+                    updated_at=datetime.now()
+                ).returning(Company.id)
+            )
             
-            if not existing_company:
+            if updated_id is None:
                 logging.error(f"The company you are trying to update does not exist. CompanyId = {company_id}")
                 return status.HTTP_404_NOT_FOUND
-            
-            existing_company.name = model.name
-            existing_company.description = model.description
-            existing_company.rating = model.rating
-            existing_company.updated_at = datetime.now()
-            db.add(existing_company)
-            db.commit()
-            
+            await db.commit()
+            await _invalidate_company(company_id)
             return status.HTTP_200_OK
     except Exception as e:
         logging.error(f"There is an error while creating or updating the company. {e}")
         return status.HTTP_500_INTERNAL_SERVER_ERROR
     
-def delete_a_company(id: UUID, db:Session) -> status:
+async def delete_a_company(id: UUID, db: AsyncSession) -> status:
     """ Delete a company
 
     Args:
         id (UUID): Id of the company to delete
-        db (Session): Db context
+        db (AsyncSession): Db context
 
     Returns:
         status: 204 No content/ 404 Not found/ 500 Internal Server Error
     """
     try:
-        company_to_delete = db.query(Company).filter(Company.id == id).first()
-        if not company_to_delete:
+        deleted_id = await db.scalar(delete(Company).where(Company.id == id).returning(Company.id))
+        if deleted_id is None:
             logging.error(f"The company id= {id} does not found to delete")
             return status.HTTP_404_NOT_FOUND
         
-        db.delete(company_to_delete)
-        db.commit()
+        await db.commit()
+        await _invalidate_company(id)
         return status.HTTP_204_NO_CONTENT
     except Exception as e:
         logging.error(f"There is an error while deleting the company with id={id}. {e}")
-        return status.HTTP_500_INTERNAL_SERVER_ERROR
\ No newline at end of file
+        return status.HTTP_500_INTERNAL_SERVER_ERROR
+
+async def _invalidate_company(id: UUID):
+    await read_through_cache.invalidate("company", id)
+    await read_through_cache.invalidate_namespace("companies")
+    await scope_versions.bump(f"company:{id}")
@@ -1,24 +1,81 @@
+from typing import AsyncIterator
 from uuid import UUID
-from sqlalchemy.orm import Session
+from sqlalchemy import Select, column, delete, func, insert, literal, literal_column, or_, select, table, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from schemas.user import User
-from models.task import TaskCreateOrUpdateModel, TaskViewModel
+from utilities.db_errors import is_foreign_key_violation
+from models.task import BulkItemResultModel, TaskBulkUpdateModel, TaskChangeViewModel, TaskChangesViewModel, TaskCreateOrUpdateModel, TaskSearchViewModel, TaskStatsViewModel, TaskViewModel
+from models.pagination import PageViewModel, DEFAULT_PAGE_SIZE
+from schemas.base_entity import ChangeOperation, Priority, TaskStatus
 from schemas.task import Task
+from schemas.task_change import TaskChange
+from schemas.task_stat import TaskStat
+from utilities.pagination import paginate, build_page, decode_change_cursor, encode_change_cursor
+from utilities.rows import fetch_row, fetch_rows
+from database import new_async_session
+from utilities.cache import scope_versions
+from utilities.pubsub import Subscription, pubsub
+from utilities.responses import get_type_adapter
+from settings import TASK_STATS_SUMMARY
 from fastapi import status
 import logging
+import re
+import uuid
 from datetime import datetime
 
-def get_all_tasks(db: Session) -> list[TaskViewModel]:
-    """ Get all tasks
+# Columns of TaskViewModel. The reads select only these columns as plain rows instead of hydrating Task entities
+TASK_VIEW_COLUMNS = (Task.id, Task.summary, Task.description, Task.status, Task.priority, Task.user_id, Task.created_at)
+# Rows fetched per round trip by the export cursor
+EXPORT_BATCH_SIZE = 1000
+# Words of a search text, e.g. "fix login-page" -> fix, login, page. Only words reach the tsquery/MATCH syntax
+SEARCH_TERM = re.compile(r"\w+")
+MAX_SEARCH_TERMS = 8
+
+def filter_tasks(query: Select, task_status: TaskStatus = None, priority: Priority = None, user_id: UUID = None) -> Select:
+    """ Push the optional task filters down into the query
+
+    Args:
+        query (Select): Query on tasks
+        task_status (TaskStatus, optional): Status to filter. Defaults to None.
+        priority (Priority, optional): Priority to filter. Defaults to None.
+        user_id (UUID, optional): User id to filter. Defaults to None.
+
+    Returns:
+        Select: The filtered query
+    """
+    if task_status is not None:
+        query = query.where(Task.status == task_status)
+    if priority is not None:
+        query = query.where(Task.priority == priority)
+    if user_id is not None:
+        query = query.where(Task.user_id == user_id)
+    return query
+
+async def get_all_tasks(
+    db: AsyncSession,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: str = None,
+    task_status: TaskStatus = None,
+    priority: Priority = None,
+    user_id: UUID = None) -> PageViewModel[TaskViewModel]:
+    """ Get a page of all tasks
 
     Args:
-        db (Session): Db Context
+        db (AsyncSession): Db Context
+        limit (int, optional): Page size. Defaults to DEFAULT_PAGE_SIZE.
+        cursor (str, optional): Cursor of the previous page. Defaults to None.
+        task_status (TaskStatus, optional): Status to filter. Defaults to None.
+        priority (Priority, optional): Priority to filter. Defaults to None.
+        user_id (UUID, optional): User id to filter. Defaults to None.
 
     Returns:
-        list[TaskViewModel]: List of the tasks
+        PageViewModel[TaskViewModel]: A page of tasks
     """
-    return db.query(Task).all()
+    query = filter_tasks(select(*TASK_VIEW_COLUMNS), task_status, priority, user_id)
+    return build_page(await fetch_rows(db, paginate(query, Task, limit, cursor)), limit)
 
-def get_task_by_id(id: UUID, user_id: UUID, is_admin: bool, db: Session) -> TaskViewModel:
+async def get_task_by_id(id: UUID, user_id: UUID, is_admin: bool, db: AsyncSession) -> TaskViewModel:
     """ Get task by Id.
         - If the user is admin, then get the task by the task id
         - If non user admin, then get the task by user_id and task id
@@ -28,116 +85,539 @@ def get_task_by_id(id: UUID, user_id: UUID, is_admin: bool, db: Session) -> Task
         id (UUID): Id of the task
         user_id (UUID): User id
         is_admin (bool): True/False
-        db (Session): Db context
+        db (AsyncSession): Db context
 
     Returns:
         TaskViewModel: A task view model
     """
-    if is_admin:
-        return db.query(Task).filter(Task.id==id).first()
-    return db.query(Task).filter(Task.id==id, Task.user_id==user_id).first()
+    query = select(*TASK_VIEW_COLUMNS).where(Task.id==id)
+    if not is_admin:
+        query = query.where(Task.user_id==user_id)
+    return await fetch_row(db, query)
 
-def get_tasks_by_user_id(user_id: UUID, db: Session) -> list[TaskViewModel]:
-    """ Get Tasks by user_id
+async def get_tasks_by_user_id(
+    user_id: UUID,
+    db: AsyncSession,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: str = None,
+    task_status: TaskStatus = None,
+    priority: Priority = None) -> PageViewModel[TaskViewModel]:
+    """ Get a page of Tasks by user_id
 
     Args:
         user_id (UUID): User id
-        db (Session): Db context
+        db (AsyncSession): Db context
+        limit (int, optional): Page size. Defaults to DEFAULT_PAGE_SIZE.
+        cursor (str, optional): Cursor of the previous page. Defaults to None.
+        task_status (TaskStatus, optional): Status to filter. Defaults to None.
+        priority (Priority, optional): Priority to filter. Defaults to None.
 
     Returns:
-        list[TaskViewModel]: A list of tasks
+        PageViewModel[TaskViewModel]: A page of tasks
     """
-    return db.query(Task).filter(Task.user_id==user_id).all()
+    query = filter_tasks(select(*TASK_VIEW_COLUMNS), task_status, priority, user_id)
+    return build_page(await fetch_rows(db, paginate(query, Task, limit, cursor)), limit)
 
-def get_tasks_by_user_ids(user_ids: list[UUID], db: Session) -> list[TaskViewModel]:
-    """ Get all Tasks by a list of user_ids
+async def get_tasks_by_user_ids(
+    user_ids: list[UUID],
+    db: AsyncSession,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: str = None,
+    task_status: TaskStatus = None,
+    priority: Priority = None,
+    user_id: UUID = None) -> PageViewModel[TaskViewModel]:
+    """ Get a page of Tasks by a list of user_ids
 
     Args:
         user_ids (list[UUID]): List of user_ids
-        db (Session): Db context
+        db (AsyncSession): Db context
+        limit (int, optional): Page size. Defaults to DEFAULT_PAGE_SIZE.
+        cursor (str, optional): Cursor of the previous page. Defaults to None.
+        task_status (TaskStatus, optional): Status to filter. Defaults to None.
+        priority (Priority, optional): Priority to filter. Defaults to None.
+        user_id (UUID, optional): User id to filter. Defaults to None.
+
+    Returns:
+        PageViewModel[TaskViewModel]: A page of tasks
+    """
+    query = filter_tasks(select(*TASK_VIEW_COLUMNS).where(Task.user_id.in_(user_ids)), task_status, priority, user_id)
+    return build_page(await fetch_rows(db, paginate(query, Task, limit, cursor)), limit)
+
+async def get_tasks_by_company_id(
+    company_id: UUID,
+    db: AsyncSession,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: str = None,
+    task_status: TaskStatus = None,
+    priority: Priority = None,
+    user_id: UUID = None) -> PageViewModel[TaskViewModel]:
+    """ Get a page of the Tasks of the active users of a company in a single query (tasks JOIN users)
+
+    Args:
+        company_id (UUID): Company id
+        db (AsyncSession): Db context
+        limit (int, optional): Page size. Defaults to DEFAULT_PAGE_SIZE.
+        cursor (str, optional): Cursor of the previous page. Defaults to None.
+        task_status (TaskStatus, optional): Status to filter. Defaults to None.
+        priority (Priority, optional): Priority to filter. Defaults to None.
+        user_id (UUID, optional): User id to filter. Defaults to None.
+
+    Returns:
+        PageViewModel[TaskViewModel]: A page of tasks
+    """
+    query = (
+        select(*TASK_VIEW_COLUMNS)
+        .join(User, Task.user_id == User.id)
+        .where(User.company_id == company_id, User.is_active == True)
+    )
+    query = filter_tasks(query, task_status, priority, user_id)
+    return build_page(await fetch_rows(db, paginate(query, Task, limit, cursor)), limit)
+
+async def get_task_stats(
+    db: AsyncSession,
+    company_id: UUID = None,
+    user_id: UUID = None,
+    use_summary: bool = TASK_STATS_SUMMARY) -> TaskStatsViewModel:
+    """ Count the tasks of the active users of a company, or of a user, by status and by priority.
+        The counts are grouped in the database: one row per (status, priority) comes back whatever the number of tasks.
+
+    Args:
+        db (AsyncSession): Db context
+        company_id (UUID, optional): Company id. Defaults to None.
+        user_id (UUID, optional): User id (or user id to filter in the company). Defaults to None.
+        use_summary (bool, optional): Sum the task_stats rows (one per user, status and priority) instead of counting the tasks. Defaults to TASK_STATS_SUMMARY.
+
+    Returns:
+        TaskStatsViewModel: Total and counts by status and by priority, 0 for the values without tasks
+    """
+    if use_summary:
+        owner_id = TaskStat.user_id
+        query = select(TaskStat.status, TaskStat.priority, func.sum(TaskStat.count)).group_by(TaskStat.status, TaskStat.priority)
+    else:
+        owner_id = Task.user_id
+        query = select(Task.status, Task.priority, func.count()).group_by(Task.status, Task.priority)
+    if company_id is not None:
+        query = query.join(User, owner_id == User.id).where(User.company_id == company_id, User.is_active == True)
+    if user_id is not None:
+        query = query.where(owner_id == user_id)
+
+    by_status, by_priority = dict.fromkeys(TaskStatus, 0), dict.fromkeys(Priority, 0)
+    for task_status, priority, count in (await db.execute(query)).all():
+        by_status[task_status] += count
+        by_priority[priority] += count
+    return TaskStatsViewModel(total=sum(by_status.values()), by_status=by_status, by_priority=by_priority)
+
+async def search_tasks(
+    q: str,
+    db: AsyncSession,
+    company_id: UUID = None,
+    user_id: UUID = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    task_status: TaskStatus = None,
+    priority: Priority = None,
+    method: str = "fulltext") -> list[TaskSearchViewModel]:
+    """ Search the tasks of the active users of a company, or of a user, by summary and description.
+        Every word must match, the last characters of a word may be missing (prefix match): "deplo back" finds "Deploy the backend".
+        - Postgres: tsvector column with a GIN index, ranked by ts_rank (a match in the summary weighs more)
+        - SQLite: FTS5 index, ranked by bm25
+        - like (other databases, or for comparison): ILIKE scan, not ranked, newest first
+
+    Args:
+        q (str): Search text
+        db (AsyncSession): Db context
+        company_id (UUID, optional): Company id. Defaults to None.
+        user_id (UUID, optional): User id (or user id to filter in the company). Defaults to None.
+        limit (int, optional): Maximum number of tasks. Defaults to DEFAULT_PAGE_SIZE.
+        task_status (TaskStatus, optional): Status to filter. Defaults to None.
+        priority (Priority, optional): Priority to filter. Defaults to None.
+        method (str, optional): fulltext or like. Defaults to fulltext.
+
+    Returns:
+        list[TaskSearchViewModel]: The best matching tasks first
+    """
+    terms = [term.lower() for term in SEARCH_TERM.findall(q)][:MAX_SEARCH_TERMS]
+    if not terms:
+        return []
+    dialect = db.get_bind().dialect.name
+    if method == "fulltext" and dialect == "postgresql":
+        search_vector = literal_column("tasks.search_vector")
+        ts_query = func.to_tsquery("simple", " & ".join(f"{term}:*" for term in terms))
+        rank = func.ts_rank(search_vector, ts_query)
+        query = select(*TASK_VIEW_COLUMNS, rank.label("rank")).where(search_vector.op("@@")(ts_query))
+    elif method == "fulltext" and dialect == "sqlite":
+        tasks_fts = table("tasks_fts", column("task_id"))
+        # bm25 is lower for better matches, one weight per column (task_id, summary, description):
+        # the summary weighs more as in the Postgres ranking
+        rank = -func.bm25(literal_column("tasks_fts"), 0.0, 1.0, 0.4)
+        query = (
+            select(*TASK_VIEW_COLUMNS, rank.label("rank"))
+            .join(tasks_fts, tasks_fts.c.task_id == Task.id)
+            .where(literal_column("tasks_fts").op("MATCH")(" ".join(f'"{term}"*' for term in terms)))
+        )
+    else:
+        rank = literal(0.0)
+        query = select(*TASK_VIEW_COLUMNS, rank.label("rank")).where(*[
+            or_(Task.summary.icontains(term, autoescape=True), Task.description.icontains(term, autoescape=True))
+            for term in terms
+        ])
+    if company_id is not None:
+        query = query.join(User, Task.user_id == User.id).where(User.company_id == company_id, User.is_active == True)
+    query = filter_tasks(query, task_status, priority, user_id)
+    return await fetch_rows(db, query.order_by(rank.desc(), Task.created_at.desc(), Task.id).limit(limit))
+
+async def get_task_changes(
+    db: AsyncSession,
+    company_id: UUID = None,
+    user_id: UUID = None,
+    since: str = None,
+    limit: int = DEFAULT_PAGE_SIZE) -> TaskChangesViewModel:
+    """ Get the tasks of the active users of a company, or of a user, inserted, updated or deleted since a cursor.
+        The change log is read by its (txid, seq) index: the cost follows the number of changes, not of tasks.
+        - Without a cursor, only the current cursor is returned: list the tasks, then sync from it
+        - The changes of a task are merged into one, with the current task (none once deleted)
+        - A task which left the scope (e.g. given to another user) is returned as deleted
+        - Postgres: only the changes of the transactions older than all running ones are returned, so a transaction
+          which commits later can not be skipped by a cursor taken before it commits
+
+    Args:
+        db (AsyncSession): Db context
+        company_id (UUID, optional): Company id. Defaults to None.
+        user_id (UUID, optional): User id. Defaults to None.
+        since (str, optional): Cursor returned by the previous call. Defaults to None.
+        limit (int, optional): Maximum number of changes read. Defaults to DEFAULT_PAGE_SIZE.
+
+    Returns:
+        TaskChangesViewModel: The changed tasks in the order of their last change, and the cursor of the next call
+    """
+    query = select(TaskChange.txid, TaskChange.seq, TaskChange.task_id, TaskChange.op, TaskChange.changed_at)
+    if company_id is not None:
+        query = query.where(TaskChange.company_id == company_id)
+    else:
+        query = query.where(TaskChange.user_id == user_id)
+    if db.get_bind().dialect.name == "postgresql":
+        query = query.where(TaskChange.txid < func.txid_snapshot_xmin(func.txid_current_snapshot()))
+
+    if since is None:
+        last = (await db.execute(query.order_by(TaskChange.txid.desc(), TaskChange.seq.desc()).limit(1))).first()
+        return TaskChangesViewModel(items=[], next_cursor=encode_change_cursor(*(last[:2] if last else (0, 0))))
+
+    position = decode_change_cursor(since)
+    query = query.where(tuple_(TaskChange.txid, TaskChange.seq) > tuple_(*position))
+    changes = (await db.execute(query.order_by(TaskChange.txid, TaskChange.seq).limit(limit + 1))).all()
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    if changes:
+        position = changes[-1][:2]
+
+    # Last change of each task, in the order of the log
+    last_changes, inserted_ids = {}, set()
+    for change in changes:
+        if change.op == ChangeOperation.INSERT:
+            inserted_ids.add(change.task_id)
+        last_changes.pop(change.task_id, None)
+        last_changes[change.task_id] = change
+    task_ids = [task_id for task_id, change in last_changes.items() if change.op != ChangeOperation.DELETE]
+    tasks = {}
+    if task_ids:
+        tasks_query = select(*TASK_VIEW_COLUMNS).where(Task.id.in_(task_ids))
+        if company_id is not None:
+            tasks_query = tasks_query.join(User, Task.user_id == User.id).where(User.company_id == company_id, User.is_active == True)
+        else:
+            tasks_query = tasks_query.where(Task.user_id == user_id)
+        tasks = {task["id"]: task for task in await fetch_rows(db, tasks_query)}
+
+    items = []
+    for task_id, change in last_changes.items():
+        task = tasks.get(task_id)
+        if task is None:
+            op = ChangeOperation.DELETE
+        else:
+            op = ChangeOperation.INSERT if task_id in inserted_ids else change.op
+        items.append({
+            "op": op,
+            "task_id": task_id,
+            "changed_at": change.changed_at,
+            "task": task
+        })
+    return TaskChangesViewModel(items=items, next_cursor=encode_change_cursor(*position), has_more=has_more)
+
+def subscribe_task_changes(company_id: UUID, user_id: UUID, is_admin: bool) -> Subscription:
+    """ Subscribe to the task changes pushed after each write (see _tasks_changed): of the company for an admin,
+        else of the tasks of the user. To be unsubscribed when the connection ends.
+
+    Args:
+        company_id (UUID): Company id
+        user_id (UUID): User id
+        is_admin (bool): Is admin
 
     Returns:
-        list[TaskViewModel]: A list of tasks
+        Subscription: The subscription, its messages are JSON lists of TaskChangeViewModel
+    """
+    return pubsub.subscribe([f"tasks:company:{company_id}" if is_admin else f"tasks:user:{user_id}"])
+
+async def export_tasks(
+    company_id: UUID = None,
+    user_id: UUID = None,
+    task_status: TaskStatus = None,
+    priority: Priority = None) -> AsyncIterator[list[dict]]:
+    """ Stream the tasks of the active users of a company, or of a user, through a server side cursor.
+        The rows are yielded in batches of EXPORT_BATCH_SIZE as they are fetched, so the memory does not grow
+        with the number of tasks. It opens its own session: a streamed response outlives the request dependencies.
+
+    Args:
+        company_id (UUID, optional): Company id. Defaults to None.
+        user_id (UUID, optional): User id (or user id to filter in the company). Defaults to None.
+        task_status (TaskStatus, optional): Status to filter. Defaults to None.
+        priority (Priority, optional): Priority to filter. Defaults to None.
+
+    Yields:
+        list[dict]: A batch of task rows ordered by created_at, id
     """
-    return db.query(Task).filter(Task.user_id.in_(user_ids)).all()
+    query = select(*TASK_VIEW_COLUMNS)
+    if company_id is not None:
+        query = query.join(User, Task.user_id == User.id).where(User.company_id == company_id, User.is_active == True)
+    query = filter_tasks(query, task_status, priority, user_id).order_by(Task.created_at, Task.id)
+    async with new_async_session() as db:
+        result = await db.stream(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        keys = list(result.keys())
+        async for partition in result.partitions():
+            yield [dict(zip(keys, row)) for row in partition]
 
-def create_or_update_a_task(user_id: UUID, is_admin: bool, model: TaskCreateOrUpdateModel, db: Session, id: UUID = None) -> status:
+async def create_or_update_a_task(user_id: UUID, is_admin: bool, model: TaskCreateOrUpdateModel, db: AsyncSession, id: UUID = None) -> status:
     """ Create or update a task
 
     Args:
         user_id (UUID): User id
         is_admin (bool): Is admin
         model (TaskCreateOrUpdateModel): Create or update task model
-        db (Session): Db context
+        db (AsyncSession): Db context
         id (UUID, optional): Id of the task in case of update. Defaults to None.
 
     Returns:
         status: 201 Created/ 404 Not found/ 403 Forbidden/ 200 Ok
     """
-    # Check if the user_id exist
-    user_exist = db.query(User).filter(User.id == user_id).first()
-    if not user_exist:
-        logging.error(f"The user id = {model.user_id} could not be found")
-        return status.HTTP_404_NOT_FOUND
-    
     if id is None: # Create new
         new_task = Task(**model.model_dump())
         new_task.user_id = user_id
         
         db.add(new_task)
-        db.commit()
+        try:
+            await db.flush()
+            logged = await _log_task_changes(db, ChangeOperation.INSERT, Task.id == new_task.id)
+            task = {column.key: getattr(new_task, column.key) for column in TASK_VIEW_COLUMNS}
+            await db.commit()
+        except IntegrityError as e:
+            await db.rollback()
+            if not is_foreign_key_violation(e):
+                raise
+            logging.error(f"The user id = {user_id} could not be found")
+            return status.HTTP_404_NOT_FOUND
+        await _tasks_changed(ChangeOperation.INSERT, [task], logged)
         return status.HTTP_201_CREATED
     
-    existing_task: Task = None
+    # Single UPDATE ... RETURNING: no row back means the task does not exist or is not owned by the user
+    query = update(Task).where(Task.id==id)
     if not is_admin:
-        existing_task = db.query(Task).filter(Task.id==id, Task.user_id == user_id).first()
-        if not existing_task:
+        query = query.where(Task.user_id == user_id)
+    # Only an admin can take the task of another user: the change is logged for the previous owner too
+    previous_owners = await _log_task_changes(db, ChangeOperation.UPDATE, query.whereclause, Task.user_id != user_id) if is_admin else []
+    updated = (await db.execute(
+        query.values(
+            summary=model.summary,
+            description=model.description,
+            priority=model.priority,
+            status=model.status,
+            user_id=user_id,
+            updated_at=datetime.now()
+        ).returning(*TASK_VIEW_COLUMNS)
+    )).mappings().first()
+    if updated is None:
+        if not is_admin:
             logging.error(f"You don't have permission to do this action")
             return status.HTTP_403_FORBIDDEN
-    else:    
-        existing_task = db.query(Task).filter(Task.id==id).first()
-        if not existing_task:
-            logging.error(f"The task id = {id} could not be found")
-            return status.HTTP_404_NOT_FOUND
-    
-    existing_task.summary = model.summary
-    existing_task.description = model.description
-    existing_task.priority = model.priority
-    existing_task.status = model.status
-    existing_task.user_id = user_id
-    existing_task.updated_at = datetime.now()
+        logging.error(f"The task id = {id} could not be found")
+        return status.HTTP_404_NOT_FOUND
    
-    db.add(existing_task)
-    db.commit()
+    logged = await _log_task_changes(db, ChangeOperation.UPDATE, Task.id == id)
+    await db.commit()
+    await _tasks_changed(ChangeOperation.UPDATE, [updated], logged, previous_owners)
     return status.HTTP_200_OK
 
-def delete_a_task(id: UUID, user_id: UUID, is_admin: bool, db: Session) -> status:
+async def delete_a_task(id: UUID, user_id: UUID, is_admin: bool, db: AsyncSession) -> status:
     """ Delete a task
 
     Args:
         id (UUID): Id of the task
         user_id (UUID): user id
         is_admin (bool): Is admin
-        db (Session): Db context
+        db (AsyncSession): Db context
 
     Returns:
         status: 403 Forbidden/ 404 Not found/ 204 No content
     """
-    task_to_delete: Task = None
+    query = delete(Task).where(Task.id==id)
     if not is_admin:
-        task_to_delete = db.query(Task).filter(Task.id==id, Task.user_id == user_id).first()
-        if not task_to_delete:
+        query = query.where(Task.user_id == user_id)
+    # Logged before the delete, while the owner of the task can still be read
+    logged = await _log_task_changes(db, ChangeOperation.DELETE, query.whereclause)
+    deleted = (await db.execute(query.returning(Task.id, Task.user_id))).mappings().first()
+    if deleted is None:
+        if not is_admin:
             logging.error(f"You don't have permission to do this action")
             return status.HTTP_403_FORBIDDEN
-    else:
-        task_to_delete = db.query(Task).filter(Task.id==id).first()
-        if not task_to_delete:
-            logging.error(f"The task with id = {id} could not found")
-            return status.HTTP_404_NOT_FOUND
+        logging.error(f"The task with id = {id} could not found")
+        return status.HTTP_404_NOT_FOUND
     
-    db.delete(task_to_delete)
-    db.commit()
+    await db.commit()
+    await _tasks_changed(ChangeOperation.DELETE, [deleted], logged)
     return status.HTTP_204_NO_CONTENT
 
+async def create_tasks(user_id: UUID, models: list[TaskCreateOrUpdateModel], db: AsyncSession) -> list[BulkItemResultModel]:
+    """ Create many tasks with a single batched INSERT in one transaction
+
+    Args:
+        user_id (UUID): User id, owner of the tasks
+        models (list[TaskCreateOrUpdateModel]): Tasks to create
+        db (AsyncSession): Db context
+
+    Returns:
+        list[BulkItemResultModel]: 201 Created/ 404 Not found (the user) result for each task, in the order of the models
+    """
+    # Set as the column defaults would, one timestamp per row, so the pushed tasks are complete
+    rows = [{**model.model_dump(), "id": uuid.uuid4(), "user_id": user_id, "created_at": datetime.now()} for model in models]
+    try:
+        await db.execute(insert(Task), rows)
+        logged = await _log_task_changes(db, ChangeOperation.INSERT, Task.id.in_([row["id"] for row in rows]))
+        await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        if not is_foreign_key_violation(e):
+            raise
+        logging.error(f"The user id = {user_id} could not be found")
+        return [
+            BulkItemResultModel(index=index, status_code=status.HTTP_404_NOT_FOUND, detail="The user could not be found")
+            for index in range(len(models))
+        ]
+    await _tasks_changed(ChangeOperation.INSERT, rows, logged)
+    return [BulkItemResultModel(index=index, id=row["id"], status_code=status.HTTP_201_CREATED) for index, row in enumerate(rows)]
 
+async def update_tasks(user_id: UUID, is_admin: bool, models: list[TaskBulkUpdateModel], db: AsyncSession) -> list[BulkItemResultModel]:
+    """ Update many tasks with a single batched UPDATE in one transaction.
+        Same rules as create_or_update_a_task: non admin users can only update their own tasks.
 
+    Args:
+        user_id (UUID): User id
+        is_admin (bool): Is admin
+        models (list[TaskBulkUpdateModel]): Tasks to update
+        db (AsyncSession): Db context
+
+    Returns:
+        list[BulkItemResultModel]: 200 Ok/ 403 Forbidden/ 404 Not found result for each task, in the order of the models
+    """
+    query = select(Task.id, Task.created_at).where(Task.id.in_({model.id for model in models}))
+    if not is_admin:
+        query = query.where(Task.user_id == user_id)
+    # The rows are locked until the commit, so a task can not be given to another user or deleted before the UPDATE.
+    # Locked in id order, so two bulk updates of the same tasks do not deadlock
+    query = query.order_by(Task.id).with_for_update()
+    # Created at of each allowed task, which completes the updated tasks pushed to the subscribers
+    allowed_tasks = dict((await db.execute(query)).all())
+
+    updated_at = datetime.now()
+    rows = [
+        {**model.model_dump(), "user_id": user_id, "updated_at": updated_at}
+        for model in models if model.id in allowed_tasks
+    ]
+    if rows:
+        # Only an admin can take the tasks of other users: the change is logged for the previous owners too
+        previous_owners = await _log_task_changes(db, ChangeOperation.UPDATE, Task.id.in_(list(allowed_tasks)), Task.user_id != user_id) if is_admin else []
+        await db.execute(update(Task), rows)
+        logged = await _log_task_changes(db, ChangeOperation.UPDATE, Task.id.in_(list(allowed_tasks)))
+        await db.commit()
+        tasks = [{**row, "created_at": allowed_tasks[row["id"]]} for row in rows]
+        await _tasks_changed(ChangeOperation.UPDATE, tasks, logged, previous_owners)
+    return [_bulk_result(index, model.id, model.id in allowed_tasks, is_admin, status.HTTP_200_OK) for index, model in enumerate(models)]
+
+async def delete_tasks(ids: list[UUID], user_id: UUID, is_admin: bool, db: AsyncSession) -> list[BulkItemResultModel]:
+    """ Delete many tasks with a single DELETE in one transaction.
+        Same rules as delete_a_task: non admin users can only delete their own tasks.
+
+    Args:
+        ids (list[UUID]): Ids of the tasks to delete
+        user_id (UUID): User id
+        is_admin (bool): Is admin
+        db (AsyncSession): Db context
+
+    Returns:
+        list[BulkItemResultModel]: 204 No content/ 403 Forbidden/ 404 Not found result for each id, in the order of the ids
+    """
+    query = delete(Task).where(Task.id.in_(set(ids))).returning(Task.id, Task.user_id)
+    if not is_admin:
+        query = query.where(Task.user_id == user_id)
+    logged = await _log_task_changes(db, ChangeOperation.DELETE, query.whereclause)
+    deleted = (await db.execute(query)).mappings().all()
+    deleted_ids = {task["id"] for task in deleted}
+    await db.commit()
+    if deleted_ids:
+        await _tasks_changed(ChangeOperation.DELETE, deleted, logged)
+    return [_bulk_result(index, id, id in deleted_ids, is_admin, status.HTTP_204_NO_CONTENT) for index, id in enumerate(ids)]
+
+async def _log_task_changes(db: AsyncSession, op: ChangeOperation, *where) -> list:
+    # Append the tasks matching the conditions to the change log with a single INSERT ... SELECT,
+    # in the transaction of the write so the log and the tasks are committed (or rolled back) together.
+    # Returns the (task_id, user_id, company_id) logged
+    txid = func.txid_current() if db.get_bind().dialect.name == "postgresql" else literal(0)
+    query = (
+        select(Task.id, Task.user_id, User.company_id, literal(op, TaskChange.op.type), txid, literal(datetime.now(), TaskChange.changed_at.type))
+        .join(User, Task.user_id == User.id)
+        .where(*where)
+    )
+    result = await db.execute(insert(TaskChange).from_select(
+        [TaskChange.task_id, TaskChange.user_id, TaskChange.company_id, TaskChange.op, TaskChange.txid, TaskChange.changed_at], query
+    ).returning(TaskChange.task_id, TaskChange.user_id, TaskChange.company_id))
+    return result.all()
+
+async def _tasks_changed(op: ChangeOperation, tasks: list, logged: list, previous_owners: list = ()):
+    """ Invalidate the task lists and push the changed tasks to the subscribers, after the commit.
+        Each subscriber gets one message per write, with the changes of the tasks of its scope:
+        the owner of the tasks, and the company of the owner for the admins.
+
+    Args:
+        op (ChangeOperation): Operation of the write
+        tasks (list): Written tasks, with the TaskViewModel columns (id and user_id for a delete)
+        logged (list): (task_id, user_id, company_id) of the tasks, as logged by _log_task_changes
+        previous_owners (list, optional): (task_id, user_id, company_id) of the users the tasks were taken from, they get them as deleted. Defaults to ().
+    """
+    # Not the company of the writer: an admin can write the tasks of another company
+    company_ids = {task_id: company_id for task_id, _, company_id in logged}
+    # The task lists of a company (admin) and of its users are validated by one version
+    scopes = {f"tasks:{company_id}" for company_id in company_ids.values()}
+    scopes.update(f"tasks:{company_id}" for _, _, company_id in previous_owners)
+    await scope_versions.bump(*scopes)
+
+    changed_at = datetime.now()
+    changes: dict[str, list] = {}
+    for task in tasks:
+        change = {"op": op, "task_id": task["id"], "changed_at": changed_at, "task": None if op == ChangeOperation.DELETE else dict(task)}
+        changes.setdefault(f"tasks:user:{task['user_id']}", []).append(change)
+        if task["id"] in company_ids:
+            changes.setdefault(f"tasks:company:{company_ids[task['id']]}", []).append(change)
+    for task_id, user_id, company_id in previous_owners:
+        change = {"op": ChangeOperation.DELETE, "task_id": task_id, "changed_at": changed_at}
+        changes.setdefault(f"tasks:user:{user_id}", []).append(change)
+        # Given to a user of another company, the task left the scope of the admins of its previous company
+        if company_id != company_ids.get(task_id):
+            changes.setdefault(f"tasks:company:{company_id}", []).append(change)
+
+    adapter = get_type_adapter(list[TaskChangeViewModel])
+    for topic, topic_changes in changes.items():
+        # Serialized once per topic, only when it has subscribers
+        if pubsub.has_subscribers(topic):
+            await pubsub.publish(topic, adapter.dump_json(adapter.validate_python(topic_changes, from_attributes=True)))
+
+def _bulk_result(index: int, id: UUID, succeeded: bool, is_admin: bool, success_status: int) -> BulkItemResultModel:
+    if succeeded:
+        return BulkItemResultModel(index=index, id=id, status_code=success_status)
+    if is_admin:
+        return BulkItemResultModel(index=index, id=id, status_code=status.HTTP_404_NOT_FOUND, detail="The task could not be found")
+    return BulkItemResultModel(index=index, id=id, status_code=status.HTTP_403_FORBIDDEN, detail="You don't have permission to do this action")
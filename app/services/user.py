@@ -1,42 +1,61 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
 from uuid import UUID
-from schemas.user import User, get_hashed_password
-from schemas.company import Company
+from schemas.user import User, get_hashed_password_async
+from utilities.db_errors import is_foreign_key_violation, is_unique_violation
 from models.user import UserViewModel, UserCreateOrUpdateModel
+from models.pagination import PageViewModel, DEFAULT_PAGE_SIZE
+from utilities.pagination import paginate, build_page
+from utilities.rows import fetch_row, fetch_rows
+from utilities.cache import read_through_cache, scope_versions
 from datetime import datetime
-from fastapi import status
+from fastapi import HTTPException, status
 import logging
 
-def get_user_by_id(id:UUID, db:Session) -> UserViewModel:
+# Columns of UserViewModel: the reads never load hashed_password nor hydrate User entities
+USER_VIEW_COLUMNS = (
+    User.id, User.user_name, User.first_name, User.last_name, User.is_active, User.is_admin, User.company_id, User.email
+)
+
+async def get_user_by_id(id:UUID, db: AsyncSession) -> UserViewModel:
     """ Get a user by Id
     
     Args:
         id (UUID): User Id to get
-        db (Session): Db context
+        db (AsyncSession): Db context
 
     Returns:
         UserViewModel: A single user object to return
     """
-    return db.query(User).filter(User.id==id, User.is_active==True).first()
+    return await read_through_cache.get_or_load(
+        "user", id, lambda: fetch_row(db, select(*USER_VIEW_COLUMNS).where(User.id==id, User.is_active==True)), UserViewModel
+    )
 
-def get_users_by_company_id(company_id, db: Session) -> list[UserViewModel]:
-    """ Get all users by company Id
+async def get_users_by_company_id(
+    company_id: UUID,
+    db: AsyncSession,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: str = None) -> PageViewModel[UserViewModel]:
+    """ Get a page of users by company Id
 
     Args:
-        company_id (_type_): Id of the company
-        db (Session): Db context
+        company_id (UUID): Id of the company
+        db (AsyncSession): Db context
+        limit (int, optional): Page size. Defaults to DEFAULT_PAGE_SIZE.
+        cursor (str, optional): Cursor of the previous page. Defaults to None.
 
     Returns:
-        list[UserViewModel]: A list of user model to return
+        PageViewModel[UserViewModel]: A page of users
     """
-    return db.query(User).filter(User.company_id==company_id, User.is_active==True).all()
+    query = select(*USER_VIEW_COLUMNS, User.created_at).where(User.company_id==company_id, User.is_active==True)
+    return build_page(await fetch_rows(db, paginate(query, User, limit, cursor)), limit)
 
-def create_or_update_user(db: Session, model: UserCreateOrUpdateModel, id: UUID = None) -> status:
+async def create_or_update_user(db: AsyncSession, model: UserCreateOrUpdateModel, id: UUID = None) -> status:
     """ Create or update user
 
     Args:
-        db (Session): Db context
+        db (AsyncSession): Db context
         model (UserCreateOrUpdateModel): User model to create or update
         id (UUID, optional): Id of the user id to update. Defaults to None.
 
@@ -44,77 +63,76 @@ def create_or_update_user(db: Session, model: UserCreateOrUpdateModel, id: UUID
         status: Http Status code
     """
     try:
-        # Check if Company exist
-        company_exist = db.query(Company).filter(Company.id == model.company_id).first()
-        if not company_exist:
-            logging.error(f"The company id={model.company_id} could not be found")
-            return status.HTTP_404_NOT_FOUND
-        
         if id is None: # Create new
             # To resolve the issue: 'password' is an invalid keyword argument for User
             password = model.password
             user_model = model.model_dump()
             del user_model['password']
-            # Check if the email AND/OR username exist in database
-            user_exist = db.query(User).filter(or_(User.email==model.email, User.user_name == model.user_name)).first()
-            if user_exist:
-                logging.error("The user_name or email have been existed")
-                return status.HTTP_409_CONFLICT
             new_user = User(**user_model)
-            new_user.hashed_password = get_hashed_password(password)
+            new_user.hashed_password = await get_hashed_password_async(password)
             
+            # A missing company or an existing email/user_name are reported by the constraints
             db.add(new_user)
-            db.commit()
+            await db.commit()
+            await scope_versions.bump(f"users:{model.company_id}")
             return status.HTTP_201_CREATED
         else: # Update
-            existing_user = db.query(User).filter(User.id==id).first()
-            if not existing_user:
-                return status.HTTP_404_NOT_FOUND
-            # Check if the email AND/OR username exist in database
-            if existing_user.email != model.email:
-                user_exist = db.query(User).filter(User.email==model.email).first()
-                if user_exist:
-                    logging.error(f"The email={model.email} exists")
-                    return status.HTTP_409_CONFLICT
-            elif existing_user.user_name != model.user_name:
-                user_exist = db.query(User).filter(User.user_name == model.user_name).first()
-                if user_exist:
-                    logging.error(f"The user_name={model.user_name} exists")
-                    return status.HTTP_409_CONFLICT
-            existing_user.user_name = model.user_name
-            existing_user.first_name = model.first_name
-            existing_user.last_name = model.last_name
-            existing_user.email = model.email
-            existing_user.is_active = model.is_active
-            existing_user.is_admin= model.is_admin
-            existing_user.updated_at = datetime.now()
+            values = {
+                "user_name": model.user_name,
+                "first_name": model.first_name,
+                "last_name": model.last_name,
+                "email": model.email,
+                "is_active": model.is_active,
+                "is_admin": model.is_admin,
+                "updated_at": datetime.now()
+            }
             # TODO: We should have a new endpoint/method to change the user password
             if model.password is not None and model.password != '':
-                existing_user.hashed_password = get_hashed_password(model.password)
+                values["hashed_password"] = await get_hashed_password_async(model.password)
             
-            db.add(existing_user)
-            db.commit()
+            company_id = await db.scalar(update(User).where(User.id==id).values(**values).returning(User.company_id))
+            if company_id is None:
+                return status.HTTP_404_NOT_FOUND
+            await db.commit()
+            await _invalidate_user(id, company_id)
             return status.HTTP_200_OK
+    except IntegrityError as e:
+        await db.rollback()
+        if is_foreign_key_violation(e):
+            logging.error(f"The company id={model.company_id} could not be found")
+            return status.HTTP_404_NOT_FOUND
+        if is_unique_violation(e):
+            logging.error(f"The user_name={model.user_name} or email={model.email} exists")
+            return status.HTTP_409_CONFLICT
+        logging.error(f"There is an error while creating or update user. {e}")
+        return status.HTTP_500_INTERNAL_SERVER_ERROR
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"There is an error while creating or update user. {e}")
         return status.HTTP_500_INTERNAL_SERVER_ERROR
     
-def delete_a_user(id: UUID, db: Session) -> status:
+async def delete_a_user(id: UUID, db: AsyncSession) -> status:
     """ Soft delete a user by set the is_active = False
 
     Args:
         id (UUID): Id of the user to delete
-        db (Session): Db context
+        db (AsyncSession): Db context
 
     Returns:
         status: 404 Not found/ 204 No content
     """
-    user_to_delete = db.query(User).filter(User.id==id).first()
-    if not user_to_delete:
+    company_id = await db.scalar(
+        update(User).where(User.id==id).values(is_active=False, updated_at=datetime.now()).returning(User.company_id)
+    )
+    if company_id is None:
         logging.error("The user does not exist to delete")
         return status.HTTP_404_NOT_FOUND
-    user_to_delete.is_active = False
-    db.add(user_to_delete)
-    db.commit()
+    await db.commit()
+    await _invalidate_user(id, company_id)
     return status.HTTP_204_NO_CONTENT
-        
\ No newline at end of file
+
+async def _invalidate_user(id: UUID, company_id: UUID):
+    await read_through_cache.invalidate("user", id)
+    # The company task list only shows the tasks of the active users
+    await scope_versions.bump(f"users:{company_id}", f"tasks:{company_id}")
@@ -3,8 +3,8 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-def get_connect_string():
-    engine = os.environ.get("DB_ENGINE")
+def get_connect_string(engine: str = None):
+    engine = engine or os.environ.get("DB_ENGINE")
     dbhost = os.environ.get("DB_HOST")
     username = os.environ.get("DB_USERNAME")
     password = os.environ.get("DB_PASSWORD")
@@ -12,6 +12,63 @@ def get_connect_string():
     port = os.environ.get("DB_PORT", "5432")
     return f"{engine}://{username}:{password}@{dbhost}:{port}/{dbname}"
 
-SQLALCHEMY_DATABASE_URL= get_connect_string()
+# DATABASE_URL/ASYNC_DATABASE_URL override the DB_* settings, e.g. to run the benchmarks on SQLite
+# The sync url is only used by the migrations (alembic), the app runs on the async one
+SQLALCHEMY_DATABASE_URL= os.environ.get("DATABASE_URL") or get_connect_string()
+SQLALCHEMY_ASYNC_DATABASE_URL = os.environ.get("ASYNC_DATABASE_URL") or get_connect_string(os.environ.get("DB_ASYNC_ENGINE", "postgresql+asyncpg"))
 JWT_SECRET = os.environ.get("JWT_SECRET")
-JWT_ALGORITHM = os.environ.get("JWT_ALGORITHM")
\ No newline at end of file
+JWT_ALGORITHM = os.environ.get("JWT_ALGORITHM")
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", min(4, os.cpu_count() or 1)))
+PASSWORD_HASH_QUEUE_LIMIT = int(os.environ.get("PASSWORD_HASH_QUEUE_LIMIT", "32"))
+TOKEN_CACHE_SIZE = int(os.environ.get("TOKEN_CACHE_SIZE", "10000"))
+TOKEN_CACHE_TTL_SECONDS = float(os.environ.get("TOKEN_CACHE_TTL_SECONDS", "60"))
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+DB_WARM_UP_CONNECTIONS = int(os.environ.get("DB_WARM_UP_CONNECTIONS", str(DB_POOL_SIZE)))
+# 0 disables the statement timeout
+DB_STATEMENT_TIMEOUT_MS = int(os.environ.get("DB_STATEMENT_TIMEOUT_MS", "0"))
+# memory (per worker) or redis (shared by the workers, needs CACHE_URL)
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "memory")
+CACHE_URL = os.environ.get("CACHE_URL")
+CACHE_MAX_SIZE = int(os.environ.get("CACHE_MAX_SIZE", "10000"))
+CACHE_TTL_SECONDS = float(os.environ.get("CACHE_TTL_SECONDS", "30"))
+# false disables the read-through cache and the ETags, serve.py sets it for several workers on the memory backend
+CACHE_ENABLED = os.environ.get("CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+# Read the task counts from the task_stats summary table (Postgres, kept up to date by triggers) instead of counting the tasks
+TASK_STATS_SUMMARY = os.environ.get("TASK_STATS_SUMMARY", "false").lower() in ("1", "true", "yes")
+# Debug only: record the statements of each request, add X-Query-* headers and log the repeated statements
+SQL_PROFILE = os.environ.get("SQL_PROFILE", "false").lower() in ("1", "true", "yes")
+SQL_PROFILE_REPEAT_THRESHOLD = int(os.environ.get("SQL_PROFILE_REPEAT_THRESHOLD", "2"))
+# Production server (serve.py). 0 workers means one per CPU, 0 concurrency limit means unlimited
+SERVER_HOST = os.environ.get("SERVER_HOST", "0.0.0.0")
+SERVER_PORT = int(os.environ.get("SERVER_PORT", "8000"))
+SERVER_WORKERS = int(os.environ.get("SERVER_WORKERS", "0"))
+SERVER_BACKLOG = int(os.environ.get("SERVER_BACKLOG", "2048"))
+SERVER_KEEP_ALIVE_SECONDS = int(os.environ.get("SERVER_KEEP_ALIVE_SECONDS", "5"))
+SERVER_LIMIT_CONCURRENCY = int(os.environ.get("SERVER_LIMIT_CONCURRENCY", "0"))
+SERVER_ACCESS_LOG = os.environ.get("SERVER_ACCESS_LOG", "false").lower() in ("1", "true", "yes")
+# Seconds a worker reports itself as not ready on SIGTERM, before it stops accepting connections
+SHUTDOWN_PRE_STOP_SECONDS = float(os.environ.get("SHUTDOWN_PRE_STOP_SECONDS", "5"))
+# Seconds given to the open connections to complete on shutdown
+SHUTDOWN_DRAIN_SECONDS = float(os.environ.get("SHUTDOWN_DRAIN_SECONDS", "30"))
+HEALTH_CHECK_TIMEOUT_SECONDS = float(os.environ.get("HEALTH_CHECK_TIMEOUT_SECONDS", "2"))
+# Push of the task changes (WebSocket, SSE): memory (per worker) or redis (shared by the workers, needs PUBSUB_URL)
+PUBSUB_BACKEND = os.environ.get("PUBSUB_BACKEND", "memory")
+PUBSUB_URL = os.environ.get("PUBSUB_URL")
+# Messages buffered per connection: a slower client is disconnected and catches up from GET /tasks/changes
+PUSH_QUEUE_SIZE = int(os.environ.get("PUSH_QUEUE_SIZE", "100"))
+PUSH_HEARTBEAT_SECONDS = float(os.environ.get("PUSH_HEARTBEAT_SECONDS", "15"))
+# false disables the push endpoints, serve.py sets it for several workers on the memory backend
+PUSH_ENABLED = os.environ.get("PUSH_ENABLED", "true").lower() in ("1", "true", "yes")
+# Rate limits (<requests>/<seconds>, empty or 0 disables): POST /auth/token per client ip and per username, /tasks and /users per user
+RATE_LIMIT_ENABLED = os.environ.get("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+# memory (per worker) or redis (shared by the workers, needs RATE_LIMIT_URL)
+RATE_LIMIT_BACKEND = os.environ.get("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_URL = os.environ.get("RATE_LIMIT_URL")
+RATE_LIMIT_MAX_KEYS = int(os.environ.get("RATE_LIMIT_MAX_KEYS", "100000"))
+RATE_LIMIT_LOGIN_IP = os.environ.get("RATE_LIMIT_LOGIN_IP", "20/60")
+RATE_LIMIT_LOGIN_USER = os.environ.get("RATE_LIMIT_LOGIN_USER", "10/60")
+RATE_LIMIT_USER = os.environ.get("RATE_LIMIT_USER", "100/10")
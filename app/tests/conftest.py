@@ -0,0 +1,40 @@
+import os
+import sys
+import tempfile
+import pytest
+
+# The app uses imports relative to its directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import configure_database, create_schema
+
+# The database must be configured before the app modules create their engines
+configure_database(f"sqlite+aiosqlite:///{tempfile.mkdtemp(prefix='todo-test-')}/test.db")
+
+import httpx
+from benchmarks.seed import PASSWORD, SeededData, seed
+from main import app
+
+
+@pytest.fixture(scope="session")
+def anyio_backend() -> str:
+    return "asyncio"
+
+@pytest.fixture(scope="session")
+async def seeded() -> SeededData:
+    """ One company with an admin and members, each owning a few tasks """
+    await create_schema()
+    return await seed(1, 4, 5)
+
+@pytest.fixture(scope="session")
+async def client(seeded: SeededData):
+    """ In-process client, the app lifespan runs around the session """
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            yield client
+
+async def log_in(client: httpx.AsyncClient, user_name: str) -> dict:
+    """ Authorization header of a seeded user """
+    response = await client.post("/auth/token", data={"username": user_name, "password": PASSWORD})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
@@ -0,0 +1,36 @@
+from uuid import UUID
+import pytest
+from database import new_async_session
+from services import task as task_service
+from utilities.sql_profiler import query_budget
+from conftest import log_in
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.mark.parametrize("admin, path, max_queries", [
+    # The company's tasks, tasks JOIN users
+    (True, "/tasks", 1),
+    # The user's own tasks
+    (False, "/tasks", 1),
+    (True, "/users", 1),
+    # Read through the cache, one query at most
+    (True, "/companies/{company_id}", 1),
+])
+async def test_read_endpoints_stay_within_their_query_budget(client, seeded, admin, path, max_queries):
+    user_name = seeded.admin_user_names[0] if admin else seeded.member_user_names[0]
+    headers = await log_in(client, user_name)
+    with query_budget(max_queries):
+        response = await client.get(path.format(company_id=seeded.company_ids[0]), headers=headers)
+    assert response.status_code == 200, response.text
+
+async def test_n_plus_one_trips_the_budget(client, seeded):
+    headers = await log_in(client, seeded.admin_user_names[0])
+    tasks = (await client.get("/tasks", headers=headers)).json()["items"]
+    assert len(tasks) > 1
+    # One query per task: the count fits the budget, the repeated statement does not
+    with pytest.raises(AssertionError, match="repeated"):
+        with query_budget(len(tasks)):
+            async with new_async_session() as db:
+                for task in tasks:
+                    await task_service.get_task_by_id(UUID(task["id"]), UUID(task["user_id"]), True, db)
@@ -0,0 +1,241 @@
+import time
+import uuid
+from collections import OrderedDict
+from utilities.responses import get_type_adapter
+from settings import CACHE_BACKEND, CACHE_URL, CACHE_MAX_SIZE, CACHE_TTL_SECONDS, CACHE_ENABLED
+
+
+class LRUCache:
+    """ Size bounded in-process cache with a time to live per entry.
+        Not thread safe: it is meant to be used from the event loop only.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict = OrderedDict()
+
+    def get(self, key, default=None):
+        """ Get a value, None (or default) in case it is missing or expired
+
+        Args:
+            key: Key of the entry
+            default (optional): Value to return on miss. Defaults to None.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return default
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key, value, ttl: float = None):
+        """ Set a value, evicting the least recently used entry when the cache is full
+
+        Args:
+            key: Key of the entry
+            value: Value to cache
+            ttl (float, optional): Time to live in seconds. Defaults to the cache ttl.
+        """
+        self._entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def delete(self, key):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class CacheBackend:
+    """ Storage of the read-through cache. Values are serialized bytes so they can be shared between workers """
+
+    is_shared = False
+
+    async def get(self, key: str) -> bytes | None:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        raise NotImplementedError
+
+    async def delete(self, key: str):
+        raise NotImplementedError
+
+    async def incr(self, key: str) -> int:
+        raise NotImplementedError
+
+
+class InMemoryCacheBackend(CacheBackend):
+    """ Per worker backend. With several workers, a write is only seen by the other workers after the ttl """
+
+    def __init__(self, max_size: int, ttl: float):
+        self._cache = LRUCache(max_size, ttl)
+        # Counters must not be evicted by the LRU
+        self._counters: dict[str, int] = {}
+
+    async def get(self, key: str) -> bytes | None:
+        counter = self._counters.get(key)
+        if counter is not None:
+            return str(counter).encode()
+        return self._cache.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        self._cache.set(key, value, ttl)
+
+    async def delete(self, key: str):
+        self._cache.delete(key)
+
+    async def incr(self, key: str) -> int:
+        self._counters[key] = self._counters.get(key, 0) + 1
+        return self._counters[key]
+
+
+class RedisCacheBackend(CacheBackend):
+    """ Backend shared by all the workers. Any client with the redis.asyncio get/set/delete/incr API works,
+        e.g. fakeredis as a local stand-in.
+    """
+
+    is_shared = True
+
+    def __init__(self, client):
+        self._client = client
+
+    async def get(self, key: str) -> bytes | None:
+        return await self._client.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        await self._client.set(key, value, px=int(ttl * 1000))
+
+    async def delete(self, key: str):
+        await self._client.delete(key)
+
+    async def incr(self, key: str) -> int:
+        return await self._client.incr(key)
+
+
+class ReadThroughCache:
+    """ Cache of pydantic models loaded from the database, grouped by namespace.
+        A namespace can be invalidated at once (e.g. every page of a list) by bumping its version.
+        When disabled every read loads the value.
+    """
+
+    def __init__(self, backend: CacheBackend, ttl: float, enabled: bool = True):
+        self.backend = backend
+        self.ttl = ttl
+        self.enabled = enabled
+        self.hits: dict[str, int] = {}
+        self.misses: dict[str, int] = {}
+
+    async def _key(self, namespace: str, key) -> str:
+        version = await self.backend.get(f"{namespace}:version")
+        return f"{namespace}:{int(version or 0)}:{key}"
+
+    async def get_or_load(self, namespace: str, key, loader, model_type):
+        """ Get a value from the cache, or load it from the database and cache it
+
+        Args:
+            namespace (str): Namespace of the value, e.g. "company"
+            key: Key of the value in the namespace, e.g. the company id
+            loader (callable): Coroutine function loading the value (ORM object or None) on a miss
+            model_type: Pydantic model the value is converted to
+
+        Returns:
+            The cached value as model_type, None in case the loader found nothing (not cached)
+        """
+        adapter = get_type_adapter(model_type)
+        if self.enabled:
+            cache_key = await self._key(namespace, key)
+            cached = await self.backend.get(cache_key)
+            if cached is not None:
+                self.hits[namespace] = self.hits.get(namespace, 0) + 1
+                return adapter.validate_json(cached)
+        self.misses[namespace] = self.misses.get(namespace, 0) + 1
+        loaded = await loader()
+        if loaded is None:
+            return None
+        value = adapter.validate_python(loaded, from_attributes=True)
+        if self.enabled:
+            await self.backend.set(cache_key, adapter.dump_json(value), self.ttl)
+        return value
+
+    async def invalidate(self, namespace: str, key):
+        """ Remove a value from the cache """
+        await self.backend.delete(await self._key(namespace, key))
+
+    async def invalidate_namespace(self, namespace: str):
+        """ Invalidate every value of a namespace """
+        await self.backend.incr(f"{namespace}:version")
+
+    def metrics(self) -> dict:
+        return {
+            namespace: {"hits": self.hits.get(namespace, 0), "misses": self.misses.get(namespace, 0)}
+            for namespace in sorted(self.hits.keys() | self.misses.keys())
+        }
+
+
+class ScopeVersions:
+    """ Opaque version of each scope of data (e.g. the tasks of a company), the validator of the conditional reads.
+        A write drops the version of the scopes it changed and the next read creates a new random one,
+        so a version never comes back after an eviction or a restart.
+        Versions expire after the ttl. When disabled there is no version, the reads are not conditional.
+    """
+
+    def __init__(self, backend: CacheBackend, ttl: float, enabled: bool = True):
+        self.backend = backend
+        self.ttl = ttl
+        self.enabled = enabled
+
+    async def get(self, scope: str) -> str:
+        """ Get the version of a scope, creating it if there is none.
+            Read it before the data: a write committed in between drops it, so it cannot outlive the data it was read with.
+
+        Args:
+            scope (str): Scope, e.g. tasks:<company id>
+
+        Returns:
+            str: The version
+        """
+        key = f"version:{scope}"
+        version = await self.backend.get(key)
+        if version is None:
+            version = uuid.uuid4().hex.encode()
+            await self.backend.set(key, version, self.ttl)
+        return version.decode()
+
+    async def bump(self, *scopes: str):
+        """ Mark the scopes as changed, to be called after the commit """
+        for scope in scopes:
+            await self.backend.delete(f"version:{scope}")
+
+
+def create_cache_backend(backend: str, url: str = None, max_size: int = 10000, ttl: float = 30) -> CacheBackend:
+    """ Create the cache backend configured in the settings
+
+    Args:
+        backend (str): "memory" or "redis"
+        url (str, optional): Redis url. Defaults to None.
+        max_size (int, optional): Max entries of the in memory backend. Defaults to 10000.
+        ttl (float, optional): Default time to live of the in memory backend. Defaults to 30.
+
+    Returns:
+        CacheBackend: The backend
+    """
+    if backend == "redis":
+        try:
+            from redis import asyncio as redis
+        except ImportError:
+            raise RuntimeError("CACHE_BACKEND=redis needs the redis package (pip install redis)")
+        return RedisCacheBackend(redis.from_url(url))
+    return InMemoryCacheBackend(max_size, ttl)
+
+
+read_through_cache = ReadThroughCache(create_cache_backend(CACHE_BACKEND, CACHE_URL, CACHE_MAX_SIZE, CACHE_TTL_SECONDS), CACHE_TTL_SECONDS, CACHE_ENABLED)
+scope_versions = ScopeVersions(read_through_cache.backend, CACHE_TTL_SECONDS, CACHE_ENABLED)
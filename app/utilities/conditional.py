@@ -0,0 +1,48 @@
+import hashlib
+from fastapi import Request, Response, status
+from utilities.cache import scope_versions
+
+# The responses depend on the caller: browsers and proxies must not share them, and must revalidate before reuse
+CACHE_CONTROL = "private, no-cache"
+
+
+async def get_etag(request: Request, scope: str, *vary) -> str | None:
+    """ ETag of a read, built from the version of the scope of data it returns, its url and the caller.
+        It is known before running the read query: an unchanged read is answered 304 without touching the database.
+
+    Args:
+        request (Request): The request
+        scope (str): Scope of data of the response, e.g. tasks:<company id>
+        *vary: Anything else the response depends on, e.g. the id of the logged user
+
+    Returns:
+        str | None: Weak ETag (the body is not hashed), None when the versions are disabled
+    """
+    if not scope_versions.enabled:
+        return None
+    version = await scope_versions.get(scope)
+    raw = "|".join(str(part) for part in (version, request.url.path, request.url.query, *vary))
+    return f'W/"{hashlib.sha256(raw.encode()).hexdigest()[:32]}"'
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """ Check the If-None-Match header of a request against the current ETag (weak comparison)
+
+    Args:
+        request (Request): The request
+        etag (str | None): Current ETag of the response
+
+    Returns:
+        bool: True if the client already has the current response
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if etag is None or not if_none_match:
+        return False
+    return etag.removeprefix("W/") in {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+
+def etag_headers(etag: str | None) -> dict:
+    if etag is None:
+        return {"Cache-Control": CACHE_CONTROL}
+    return {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+
+def not_modified_response(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=etag_headers(etag))
@@ -0,0 +1,38 @@
+from sqlalchemy.exc import IntegrityError
+
+# SQLSTATE codes, see https://www.postgresql.org/docs/current/errcodes-appendix.html
+FOREIGN_KEY_VIOLATION = "23503"
+UNIQUE_VIOLATION = "23505"
+
+
+def _sqlstate(error: IntegrityError) -> str | None:
+    # psycopg2 and the asyncpg adapter both expose the SQLSTATE as pgcode
+    return getattr(error.orig, "pgcode", None) or getattr(error.orig, "sqlstate", None)
+
+def is_foreign_key_violation(error: IntegrityError) -> bool:
+    """ Check if an IntegrityError was raised by a foreign key constraint
+
+    Args:
+        error (IntegrityError): The error
+
+    Returns:
+        bool: True if a referenced row does not exist
+    """
+    sqlstate = _sqlstate(error)
+    if sqlstate is not None:
+        return sqlstate == FOREIGN_KEY_VIOLATION
+    return "FOREIGN KEY constraint failed" in str(error.orig)
+
+def is_unique_violation(error: IntegrityError) -> bool:
+    """ Check if an IntegrityError was raised by a unique constraint/index
+
+    Args:
+        error (IntegrityError): The error
+
+    Returns:
+        bool: True if the row conflicts with an existing one
+    """
+    sqlstate = _sqlstate(error)
+    if sqlstate is not None:
+        return sqlstate == UNIQUE_VIOLATION
+    return "UNIQUE constraint failed" in str(error.orig)
@@ -0,0 +1,104 @@
+import base64
+import binascii
+from datetime import datetime
+from uuid import UUID
+from fastapi import status
+from sqlalchemy import Select, tuple_
+from models.pagination import PageViewModel
+from utilities.utils import http_exception
+
+
+def encode_cursor(created_at: datetime, id: UUID) -> str:
+    """ Encode the keyset (created_at, id) of the last row of a page into an opaque cursor
+
+    Args:
+        created_at (datetime): Created at of the last row
+        id (UUID): Id of the last row
+
+    Returns:
+        str: Url safe cursor
+    """
+    raw = f"{created_at.isoformat()}|{id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple[datetime, UUID]:
+    """ Decode a cursor created by encode_cursor
+
+    Args:
+        cursor (str): The cursor
+
+    Raises:
+        http_exception: 400 Bad request in case the cursor is malformed
+
+    Returns:
+        tuple[datetime, UUID]: The keyset (created_at, id)
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, id = raw.split("|")
+        return datetime.fromisoformat(created_at), UUID(id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise http_exception(status.HTTP_400_BAD_REQUEST, "The cursor is invalid")
+
+def encode_change_cursor(txid: int, seq: int) -> str:
+    """ Encode the position (txid, seq) of the last change read from a change log into an opaque cursor
+
+    Args:
+        txid (int): Transaction id of the change
+        seq (int): Sequence number of the change
+
+    Returns:
+        str: Url safe cursor
+    """
+    return base64.urlsafe_b64encode(f"{txid}|{seq}".encode()).decode().rstrip("=")
+
+def decode_change_cursor(cursor: str) -> tuple[int, int]:
+    """ Decode a cursor created by encode_change_cursor
+
+    Args:
+        cursor (str): The cursor
+
+    Raises:
+        http_exception: 400 Bad request in case the cursor is malformed
+
+    Returns:
+        tuple[int, int]: The position (txid, seq)
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        txid, seq = raw.split("|")
+        return int(txid), int(seq)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise http_exception(status.HTTP_400_BAD_REQUEST, "The cursor is invalid")
+
+def paginate(query: Select, entity, limit: int, cursor: str = None) -> Select:
+    """ Apply keyset pagination ordered by (created_at, id) to a query.
+        One extra row is fetched to know whether there is a next page.
+
+    Args:
+        query (Select): Query to paginate
+        entity: Mapped class which has created_at and id columns
+        limit (int): Page size
+        cursor (str, optional): Cursor of the previous page. Defaults to None.
+
+    Returns:
+        Select: The paginated query
+    """
+    if cursor is not None:
+        query = query.where(tuple_(entity.created_at, entity.id) > tuple_(*decode_cursor(cursor)))
+    return query.order_by(entity.created_at, entity.id).limit(limit + 1)
+
+def build_page(rows: list[dict], limit: int) -> PageViewModel:
+    """ Build a page from the rows fetched by a paginated query
+
+    Args:
+        rows (list[dict]): Rows fetched by the query built by paginate (see utilities.rows.fetch_rows)
+        limit (int): Page size
+
+    Returns:
+        PageViewModel: Page with the items and the cursor of the next page
+    """
+    if len(rows) <= limit:
+        return PageViewModel(items=rows)
+    items = rows[:limit]
+    return PageViewModel(items=items, next_cursor=encode_cursor(items[-1]["created_at"], items[-1]["id"]))
@@ -0,0 +1,89 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import status
+from utilities.utils import http_exception
+from utilities.metrics import Histogram
+from settings import PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE_LIMIT
+
+password_hash_duration = Histogram("password_hash_duration_seconds", "Duration of the bcrypt hash/verify operations")
+
+
+class PasswordHasher:
+    """ Run bcrypt hashing/verification on a bounded thread pool so it never blocks the event loop.
+        bcrypt releases the GIL while hashing, so threads give real parallelism here.
+    """
+
+    def __init__(self, max_workers: int, queue_limit: int):
+        self.max_workers = max_workers
+        self.queue_limit = queue_limit
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="password-hasher")
+        self._pending = 0
+        self.rejected_total = 0
+        self.completed_total = 0
+        self.hash_seconds_total = 0.0
+        self.hash_seconds_max = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        """ Number of submitted operations which are waiting for a free worker """
+        return max(self._pending - self.max_workers, 0)
+
+    @property
+    def in_flight(self) -> int:
+        return min(self._pending, self.max_workers)
+
+    async def run(self, func, *args):
+        """ Run a hashing function on the pool
+
+        Args:
+            func (callable): Blocking function to run
+            *args: Arguments of the function
+
+        Raises:
+            http_exception: 503 Service unavailable in case the pool and its queue are full
+
+        Returns:
+            The result of the function
+        """
+        if self._pending >= self.max_workers + self.queue_limit:
+            self.rejected_total += 1
+            raise http_exception(status.HTTP_503_SERVICE_UNAVAILABLE, "The server is busy, please try again later")
+        self._pending += 1
+        try:
+            result, elapsed = await asyncio.get_running_loop().run_in_executor(self._executor, _timed, func, *args)
+        finally:
+            self._pending -= 1
+        # Counters are only touched from the event loop thread
+        self.completed_total += 1
+        self.hash_seconds_total += elapsed
+        self.hash_seconds_max = max(self.hash_seconds_max, elapsed)
+        password_hash_duration.observe(elapsed)
+        return result
+
+    def metrics(self) -> dict:
+        """ Snapshot of the pool metrics
+
+        Returns:
+            dict: Pool size, queue depth and hash latency
+        """
+        return {
+            "max_workers": self.max_workers,
+            "queue_limit": self.queue_limit,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "completed_total": self.completed_total,
+            "rejected_total": self.rejected_total,
+            "hash_seconds_total": self.hash_seconds_total,
+            "hash_seconds_avg": self.hash_seconds_total / self.completed_total if self.completed_total else 0.0,
+            "hash_seconds_max": self.hash_seconds_max
+        }
+
+
+def _timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+
+password_hasher = PasswordHasher(PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE_LIMIT)
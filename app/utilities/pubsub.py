@@ -0,0 +1,205 @@
+import asyncio
+import logging
+from typing import Iterable
+from settings import PUBSUB_BACKEND, PUBSUB_URL, PUSH_QUEUE_SIZE
+
+
+class Subscription:
+    """ Messages of some topics for one connection, buffered in a bounded queue.
+        A consumer which falls PUSH_QUEUE_SIZE messages behind is ended instead of slowing down the publishers
+        or growing the memory: its client reconnects and catches up from the change feed.
+    """
+
+    def __init__(self, topics: Iterable[str], max_size: int):
+        self.topics = frozenset(topics)
+        self.overflowed = False
+        self.closed = False
+        self._queue: asyncio.Queue = asyncio.Queue(max_size)
+
+    def put(self, message: bytes) -> bool:
+        """ Buffer a message without waiting, ending the subscription when the buffer is full
+
+        Args:
+            message (bytes): The message
+
+        Returns:
+            bool: False in case the subscription is ended
+        """
+        if self.closed:
+            return False
+        try:
+            self._queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            self.close(overflowed=True)
+            return False
+
+    def close(self, overflowed: bool = False):
+        """ End the subscription: the consumer gets None once it has read the buffered messages (none after an overflow)
+
+        Args:
+            overflowed (bool, optional): Messages were lost, the client has to catch up. Defaults to False.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        # None does not fit in a full buffer
+        if overflowed or self._queue.full():
+            self.overflowed = True
+        if self.overflowed:
+            while not self._queue.empty():
+                self._queue.get_nowait()
+        self._queue.put_nowait(None)
+
+    async def get(self) -> bytes | None:
+        """ Wait for the next message, None once the subscription is ended """
+        return await self._queue.get()
+
+
+class PubSub:
+    """ Delivers the messages published to a topic to the subscriptions of the topic, in this worker.
+        Publishing never waits for the consumers: each subscription has its own bounded buffer.
+    """
+
+    # True when the messages published by a worker reach the subscriptions of all the workers
+    is_shared = False
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._subscriptions: dict[str, set[Subscription]] = {}
+        self.published = 0
+        self.overflowed = 0
+
+    def subscribe(self, topics: Iterable[str]) -> Subscription:
+        """ Subscribe to topics, to be unsubscribed when the connection ends
+
+        Args:
+            topics (Iterable[str]): Topics, e.g. tasks:user:<user id>
+
+        Returns:
+            Subscription: The subscription
+        """
+        subscription = Subscription(topics, self.max_size)
+        for topic in subscription.topics:
+            self._subscriptions.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscription.close()
+        for topic in subscription.topics:
+            subscribers = self._subscriptions.get(topic)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscriptions[topic]
+
+    def has_subscribers(self, *topics: str) -> bool:
+        """ Whether a message published to one of the topics would be delivered, so the publisher can skip building it """
+        return self.is_shared or any(topic in self._subscriptions for topic in topics)
+
+    async def publish(self, topic: str, message: bytes):
+        """ Publish a message to a topic
+
+        Args:
+            topic (str): Topic
+            message (bytes): Message, serialized once for all the subscriptions
+        """
+        self._deliver(topic, message)
+
+    def _deliver(self, topic: str, message: bytes):
+        self.published += 1
+        for subscription in list(self._subscriptions.get(topic, ())):
+            if not subscription.put(message):
+                self.overflowed += subscription.overflowed
+                self.unsubscribe(subscription)
+
+    def close_subscriptions(self, overflowed: bool = False):
+        """ End all the subscriptions, e.g. when the worker shuts down
+
+        Args:
+            overflowed (bool, optional): Messages were lost, the clients have to catch up. Defaults to False.
+        """
+        for subscribers in list(self._subscriptions.values()):
+            for subscription in list(subscribers):
+                subscription.close(overflowed)
+                self.unsubscribe(subscription)
+
+    async def close(self):
+        self.close_subscriptions()
+
+    def metrics(self) -> dict:
+        return {
+            "subscriptions": len({subscription for subscribers in self._subscriptions.values() for subscription in subscribers}),
+            "topics": len(self._subscriptions),
+            "published": self.published,
+            "overflowed": self.overflowed
+        }
+
+
+class RedisPubSub(PubSub):
+    """ Broker shared by the workers: the messages are published to Redis channels and each worker delivers
+        the messages of its subscriptions. The worker listens to Redis only while it has subscriptions.
+    """
+
+    is_shared = True
+    CHANNEL_PREFIX = "pubsub:"
+
+    def __init__(self, client, max_size: int):
+        super().__init__(max_size)
+        self._client = client
+        self._listener: asyncio.Task | None = None
+
+    def subscribe(self, topics: Iterable[str]) -> Subscription:
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+        return super().subscribe(topics)
+
+    async def publish(self, topic: str, message: bytes):
+        await self._client.publish(f"{self.CHANNEL_PREFIX}{topic}", message)
+
+    async def _listen(self):
+        pubsub = self._client.pubsub()
+        try:
+            await pubsub.psubscribe(f"{self.CHANNEL_PREFIX}*")
+            while self._subscriptions:
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message is not None and message["type"] == "pmessage":
+                    channel = message["channel"].decode() if isinstance(message["channel"], bytes) else message["channel"]
+                    self._deliver(channel.removeprefix(self.CHANNEL_PREFIX), message["data"])
+        except Exception as e:
+            # The subscriptions are ended, their clients reconnect and catch up from the change feed
+            logging.error(f"There is an error while listening to the pubsub broker. {e}")
+            self.close_subscriptions(overflowed=True)
+        finally:
+            # A subscription made from now on starts a new listener
+            self._listener = None
+            await pubsub.aclose()
+
+    async def close(self):
+        await super().close()
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+
+
+def create_pubsub(backend: str, url: str = None, max_size: int = 100) -> PubSub:
+    """ Create the pubsub configured in the settings
+
+    Args:
+        backend (str): "memory" or "redis"
+        url (str, optional): Redis url. Defaults to None.
+        max_size (int, optional): Messages buffered per subscription. Defaults to 100.
+
+    Returns:
+        PubSub: The pubsub
+    """
+    if backend == "redis":
+        try:
+            from redis import asyncio as redis
+        except ImportError:
+            raise RuntimeError("PUBSUB_BACKEND=redis needs the redis package (pip install redis)")
+        return RedisPubSub(redis.from_url(url), max_size)
+    return PubSub(max_size)
+
+
+pubsub = create_pubsub(PUBSUB_BACKEND, PUBSUB_URL, PUSH_QUEUE_SIZE)
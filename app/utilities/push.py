@@ -0,0 +1,95 @@
+import asyncio
+import time
+from typing import AsyncIterator
+from fastapi import WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+from settings import PUSH_HEARTBEAT_SECONDS
+from utilities.pubsub import Subscription, pubsub
+
+EVENT_STREAM_MEDIA_TYPE = "text/event-stream"
+
+
+def event_stream_response(subscription: Subscription, expires_at: float) -> StreamingResponse:
+    """ Stream the messages of a subscription as Server-Sent Events, until the client disconnects,
+        the subscription overflows (event overflow), the worker shuts down (event shutdown) or the token expires (event expired)
+
+    Args:
+        subscription (Subscription): The subscription, unsubscribed when the stream ends
+        expires_at (float): Expiry of the token (epoch seconds)
+
+    Returns:
+        StreamingResponse: The event stream
+    """
+    return StreamingResponse(
+        _events(subscription, expires_at),
+        media_type=EVENT_STREAM_MEDIA_TYPE,
+        # Proxies must neither cache nor buffer the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def _events(subscription: Subscription, expires_at: float) -> AsyncIterator[bytes]:
+    try:
+        yield b"retry: 5000\n\n"
+        while True:
+            timeout = min(PUSH_HEARTBEAT_SECONDS, expires_at - time.time())
+            if timeout <= 0:
+                yield b"event: expired\ndata: {}\n\n"
+                return
+            try:
+                message = await asyncio.wait_for(subscription.get(), timeout)
+            except asyncio.TimeoutError:
+                # A comment line keeps the connection open through the proxies
+                yield b": heartbeat\n\n"
+                continue
+            if message is None:
+                yield b"event: overflow\ndata: {}\n\n" if subscription.overflowed else b"event: shutdown\ndata: {}\n\n"
+                return
+            yield b"event: tasks\ndata: " + message + b"\n\n"
+    finally:
+        pubsub.unsubscribe(subscription)
+
+async def push_to_websocket(websocket: WebSocket, subscription: Subscription, expires_at: float):
+    """ Send the messages of a subscription as text frames to an accepted websocket, until the client disconnects,
+        the subscription overflows (closed with 1013 Try again later), the worker shuts down (closed with 1001 Going away)
+        or the token expires (closed with 1008 Policy violation).
+        Uvicorn pings the client to keep the connection open.
+
+    Args:
+        websocket (WebSocket): The accepted websocket
+        subscription (Subscription): The subscription, unsubscribed when the connection ends
+        expires_at (float): Expiry of the token (epoch seconds)
+    """
+    receiver = asyncio.create_task(_close_on_disconnect(websocket, subscription))
+    try:
+        while True:
+            timeout = expires_at - time.time()
+            if timeout <= 0:
+                await websocket.close(status.WS_1008_POLICY_VIOLATION, "The token has expired")
+                return
+            try:
+                message = await asyncio.wait_for(subscription.get(), timeout)
+            except asyncio.TimeoutError:
+                continue
+            if message is None:
+                # Ended by an overflow, by the shutdown of the worker, or by the disconnect of the client (receiver done)
+                if receiver.done():
+                    return
+                if subscription.overflowed:
+                    await websocket.close(status.WS_1013_TRY_AGAIN_LATER, "The client is too slow")
+                else:
+                    await websocket.close(status.WS_1001_GOING_AWAY, "The server is shutting down")
+                return
+            await websocket.send_text(message.decode())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+        pubsub.unsubscribe(subscription)
+
+async def _close_on_disconnect(websocket: WebSocket, subscription: Subscription):
+    # The client sends nothing, reading is how its disconnect is seen
+    try:
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+    finally:
+        subscription.close()
@@ -0,0 +1,131 @@
+import time
+from dataclasses import dataclass
+from utilities.cache import LRUCache
+
+
+@dataclass(frozen=True, slots=True)
+class Rate:
+    """ Token bucket of `burst` requests, refilled at `burst` requests per `period` seconds """
+    burst: int
+    period: float
+
+    @property
+    def per_second(self) -> float:
+        return self.burst / self.period
+
+
+def parse_rate(spec: str) -> Rate | None:
+    """ Parse a rate setting
+
+    Args:
+        spec (str): <requests>/<seconds>, e.g. 20/60. Empty or 0 disables the limit
+
+    Raises:
+        ValueError: In case the setting is malformed
+
+    Returns:
+        Rate | None: The rate, None if disabled
+    """
+    if not spec or spec.strip() == "0":
+        return None
+    burst, _, period = spec.partition("/")
+    rate = Rate(int(burst), float(period or 1))
+    if rate.burst <= 0 or rate.period <= 0:
+        raise ValueError(f"Invalid rate {spec!r}, expected <requests>/<seconds>")
+    return rate
+
+
+class RateLimitBackend:
+    """ Storage of the token buckets """
+
+    is_shared = False
+
+    async def acquire(self, key: str, rate: Rate) -> float:
+        """ Take a token from the bucket of a key
+
+        Args:
+            key (str): Key of the bucket, e.g. auth:ip:<ip>
+            rate (Rate): Rate of the bucket
+
+        Returns:
+            float: 0 if the token was taken, else the seconds until one is available
+        """
+        raise NotImplementedError
+
+
+class InMemoryRateLimitBackend(RateLimitBackend):
+    """ Per worker buckets, in a size bounded LRU. A bucket expires once it would be full again,
+        so idle keys do not use memory. With several workers each one enforces the rate on its own.
+    """
+
+    def __init__(self, max_size: int):
+        self._buckets = LRUCache(max_size, 0)
+
+    async def acquire(self, key: str, rate: Rate) -> float:
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.get(key, (rate.burst, now))
+        tokens = min(rate.burst, tokens + (now - updated_at) * rate.per_second)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / rate.per_second
+        self._buckets.set(key, (tokens, now), (rate.burst - tokens) / rate.per_second)
+        return wait
+
+
+# Refill and take a token in one step, with the clock of Redis so that the workers agree
+TOKEN_BUCKET_SCRIPT = """
+local burst = tonumber(ARGV[1])
+local per_second = tonumber(ARGV[2])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(bucket[1]) or burst
+local updated_at = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated_at) * per_second)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / per_second
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((burst - tokens) / per_second * 1000) + 1)
+return tostring(wait)
+"""
+
+
+class RedisRateLimitBackend(RateLimitBackend):
+    """ Buckets shared by all the workers, updated atomically by a Lua script """
+
+    is_shared = True
+    KEY_PREFIX = "ratelimit:"
+
+    def __init__(self, client):
+        self._client = client
+        self._script = client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    async def acquire(self, key: str, rate: Rate) -> float:
+        wait = await self._script(keys=[f"{self.KEY_PREFIX}{key}"], args=[rate.burst, repr(rate.per_second)])
+        return float(wait)
+
+
+def create_rate_limit_backend(backend: str, url: str = None, max_size: int = 100000) -> RateLimitBackend:
+    """ Create the rate limit backend configured in the settings
+
+    Args:
+        backend (str): "memory" or "redis"
+        url (str, optional): Redis url. Defaults to None.
+        max_size (int, optional): Max buckets of the in memory backend. Defaults to 100000.
+
+    Returns:
+        RateLimitBackend: The backend
+    """
+    if backend == "redis":
+        try:
+            from redis import asyncio as redis
+        except ImportError:
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis needs the redis package (pip install redis)")
+        return RedisRateLimitBackend(redis.from_url(url))
+    return InMemoryRateLimitBackend(max_size)
@@ -0,0 +1,83 @@
+import csv
+import io
+from functools import cache
+from typing import AsyncIterator
+from fastapi import Response, status
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
+
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+@cache
+def get_type_adapter(model_type) -> TypeAdapter:
+    """ Get the (cached) TypeAdapter of a model type, building its validator and serializer only once
+
+    Args:
+        model_type: Pydantic model or type, e.g. PageViewModel[TaskViewModel]
+
+    Returns:
+        TypeAdapter: Adapter of the type
+    """
+    return TypeAdapter(model_type)
+
+
+def json_response(model_type, content, status_code: int = status.HTTP_200_OK, headers: dict = None) -> Response:
+    """ Build a JSON response straight from ORM objects, rows or models.
+        The content is validated once from its attributes and dumped to bytes by pydantic-core,
+        instead of FastAPI validating the returned value and re-encoding it with jsonable_encoder.
+        Declare the model with response_model= on the route to keep the OpenAPI schema.
+
+    Args:
+        model_type: Pydantic model or type of the content
+        content: ORM objects, rows or models matching model_type
+        status_code (int, optional): Http status code. Defaults to 200.
+        headers (dict, optional): Extra headers, e.g. the ETag. Defaults to None.
+
+    Returns:
+        Response: The JSON response
+    """
+    adapter = get_type_adapter(model_type)
+    body = adapter.dump_json(adapter.validate_python(content, from_attributes=True))
+    return Response(content=body, status_code=status_code, headers=headers, media_type="application/json")
+
+
+def export_response(model_type, batches: AsyncIterator[list], format: str, filename: str) -> StreamingResponse:
+    """ Stream batches of rows as NDJSON (one JSON object per line) or CSV (with a header line).
+        Each batch is encoded and sent as soon as it is fetched.
+
+    Args:
+        model_type: Pydantic model of the rows
+        batches (AsyncIterator[list]): Batches of ORM objects, rows or dicts matching model_type
+        format (str): ndjson or csv
+        filename (str): Name of the downloaded file, without extension
+
+    Returns:
+        StreamingResponse: The streamed response
+    """
+    encode = _ndjson_chunks if format == "ndjson" else _csv_chunks
+    return StreamingResponse(
+        encode(model_type, batches),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{format}"'}
+    )
+
+async def _ndjson_chunks(model_type, batches: AsyncIterator[list]) -> AsyncIterator[bytes]:
+    adapter = get_type_adapter(list[model_type])
+    async for batch in batches:
+        yield b"".join(item.__pydantic_serializer__.to_json(item) + b"\n" for item in adapter.validate_python(batch, from_attributes=True))
+
+async def _csv_chunks(model_type, batches: AsyncIterator[list]) -> AsyncIterator[bytes]:
+    adapter = get_type_adapter(list[model_type])
+    fields = list(model_type.model_fields)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    # The header goes out before the first rows are fetched
+    yield buffer.getvalue().encode()
+    async for batch in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        for row in adapter.dump_python(adapter.validate_python(batch, from_attributes=True), mode="json"):
+            writer.writerow([row[field] for field in fields])
+        yield buffer.getvalue().encode()
@@ -0,0 +1,33 @@
+from sqlalchemy import Select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+async def fetch_rows(db: AsyncSession, query: Select) -> list[dict]:
+    """ Run a column query and return its rows as plain dicts.
+        Nothing is hydrated nor tracked by the session, and pydantic validates dicts
+        much faster than it reads the attributes of ORM objects or Row objects.
+
+    Args:
+        db (AsyncSession): Db context
+        query (Select): Query selecting columns, e.g. select(Task.id, Task.summary)
+
+    Returns:
+        list[dict]: The rows, keyed by column name
+    """
+    result = await db.execute(query)
+    keys = list(result.keys())
+    return [dict(zip(keys, row)) for row in result]
+
+async def fetch_row(db: AsyncSession, query: Select) -> dict | None:
+    """ Run a column query and return its first row as a plain dict
+
+    Args:
+        db (AsyncSession): Db context
+        query (Select): Query selecting columns
+
+    Returns:
+        dict | None: The first row, None in case there is no row
+    """
+    result = await db.execute(query)
+    row = result.first()
+    return dict(zip(result.keys(), row)) if row is not None else None
@@ -0,0 +1,114 @@
+import os
+import sys
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from greenlet import getcurrent
+
+# Frames outside the app (SQLAlchemy, asyncio, site-packages), the hooks and the query helpers are skipped to find the call site
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + os.sep
+_SKIPPED_FILES = (
+    os.path.join(APP_DIR, "database.py"),
+    os.path.join(APP_DIR, "utilities", "rows.py"),
+    os.path.abspath(__file__)
+)
+
+
+class QueryProfile:
+    """ Statements run while a profile is active, with their duration and call site.
+        A profile records into its parent too, so a query budget still counts the queries
+        when the profiling middleware opens a profile per request.
+    """
+
+    def __init__(self, parent: "QueryProfile" = None):
+        self.parent = parent
+        # (statement, seconds, call site)
+        self.statements: list[tuple[str, float, str]] = []
+
+    def record(self, statement: str, seconds: float, call_site: str):
+        self.statements.append((statement, seconds, call_site))
+        if self.parent is not None:
+            self.parent.record(statement, seconds, call_site)
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    @property
+    def seconds(self) -> float:
+        return sum(seconds for _, seconds, _ in self.statements)
+
+    def repeated(self, threshold: int = 2) -> dict[str, int]:
+        """ Identical statements run at least threshold times, the usual sign of an N+1 (e.g. a lazy relationship per row)
+
+        Args:
+            threshold (int, optional): Minimum number of runs. Defaults to 2.
+
+        Returns:
+            dict[str, int]: Number of runs by statement
+        """
+        return {statement: count for statement, count in Counter(s for s, _, _ in self.statements).items() if count >= threshold}
+
+    def report(self) -> str:
+        """ Human readable list of the statements
+
+        Returns:
+            str: One line per statement with its duration and call site
+        """
+        lines = [f"{self.count} queries in {self.seconds * 1000:.1f} ms"]
+        for statement, seconds, call_site in self.statements:
+            lines.append(f"  {seconds * 1000:7.2f} ms  {call_site}  {' '.join(statement.split())}")
+        return "\n".join(lines)
+
+
+current_query_profile: ContextVar[QueryProfile | None] = ContextVar("current_query_profile", default=None)
+
+
+def get_call_site() -> str:
+    """ File and line of the app code which ran the current statement
+
+    Returns:
+        str: e.g. services/task.py:62 in get_tasks_by_user_id
+    """
+    # The async engine runs the cursor in a greenlet: the awaiting app code is on the stack of the parent greenlet
+    frame, current = sys._getframe(1), getcurrent()
+    while True:
+        while frame is not None:
+            filename = frame.f_code.co_filename
+            if filename.startswith(APP_DIR) and filename not in _SKIPPED_FILES:
+                return f"{filename[len(APP_DIR):]}:{frame.f_lineno} in {frame.f_code.co_name}"
+            frame = frame.f_back
+        current = current.parent
+        if current is None:
+            return "<unknown>"
+        frame = current.gr_frame
+
+@contextmanager
+def query_budget(max_queries: int, max_repeated: int = 1):
+    """ Fail when the code run in the block exceeds a number of queries, or repeats an identical statement.
+        Meant for the tests, e.g. with an in-process client:
+
+            with query_budget(2):
+                await client.get("/tasks", headers=headers)
+
+    Args:
+        max_queries (int): Maximum number of queries
+        max_repeated (int, optional): Maximum runs of an identical statement. Defaults to 1.
+
+    Raises:
+        AssertionError: In case the budget is exceeded, with the list of the statements
+
+    Yields:
+        QueryProfile: The statements run in the block
+    """
+    profile = QueryProfile(current_query_profile.get())
+    token = current_query_profile.set(profile)
+    try:
+        yield profile
+    finally:
+        current_query_profile.reset(token)
+    if profile.count > max_queries:
+        raise AssertionError(f"Query budget exceeded: {profile.count} > {max_queries}\n{profile.report()}")
+    repeated = profile.repeated(max_repeated + 1)
+    if repeated:
+        raise AssertionError(f"Statements repeated more than {max_repeated} times: {list(repeated.values())}\n{profile.report()}")